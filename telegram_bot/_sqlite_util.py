@@ -0,0 +1,38 @@
+"""
+Общее синхронное подключение к SQLite для служебных скриптов и миграций
+"""
+
+import sqlite3
+
+from config import DB_PATH_STR
+
+# Те же настройки, что и у движка бота: WAL и busy_timeout не дают скриптам
+# конкурировать с работающим ботом за блокировку записи ("database is locked")
+CONNECT_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA busy_timeout=5000;
+PRAGMA synchronous=NORMAL;
+"""
+
+
+def connect(readonly: bool = False) -> sqlite3.Connection:
+    """
+    Открывает соединение с базой бота с настроенными PRAGMA.
+
+    Соединение работает в режиме autocommit (isolation_level=None),
+    транзакции открываются явно через BEGIN.
+
+    Args:
+        readonly: Открыть базу только для чтения
+
+    Returns:
+        sqlite3.Connection
+    """
+    if readonly:
+        conn = sqlite3.connect(f"file:{DB_PATH_STR}?mode=ro", uri=True, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    conn = sqlite3.connect(DB_PATH_STR, timeout=5.0, isolation_level=None)
+    conn.executescript(CONNECT_PRAGMAS)
+    return conn
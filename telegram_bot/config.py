@@ -3,28 +3,52 @@
 """
 
 import os
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType, SimpleNamespace
 from dotenv import load_dotenv
 
-# Загружаем переменные окружения из .env файла
-load_dotenv()
+
+@lru_cache(maxsize=1)
+def _settings() -> SimpleNamespace:
+    """
+    Читает переменные окружения один раз за процесс
+
+    load_dotenv() и разбор os.getenv выполняются только при первом вызове,
+    последующие обращения получают уже готовый namespace.
+    """
+    # Загружаем переменные окружения из .env файла
+    load_dotenv()
+    return SimpleNamespace(
+        BOT_TOKEN=os.getenv("BOT_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN_HERE"),
+        PROXY=os.getenv("PROXY", None),
+        TELETHON_API_ID=int(os.getenv("TELETHON_API_ID", "0")),
+        TELETHON_API_HASH=os.getenv("TELETHON_API_HASH", ""),
+        TELETHON_PHONE=os.getenv("TELETHON_PHONE", ""),
+        TELETHON_SESSION=os.getenv("TELETHON_SESSION", ""),
+        TTS_CONCURRENCY=int(os.getenv("TTS_CONCURRENCY", "1")),
+        AUDIO_DIR=os.getenv("AUDIO_DIR", ""),
+    )
+
+
+_env = _settings()
 
 # Telegram Bot Token
-BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_TELEGRAM_BOT_TOKEN_HERE")
+BOT_TOKEN = _env.BOT_TOKEN
 
 # Прокси (если Telegram заблокирован в вашей стране)
 # Раскомментируйте и настройте если нужно:
 # PROXY = "http://proxy-server:port"
 # PROXY = "socks5://proxy-server:port"
-PROXY = os.getenv("PROXY", None)
+PROXY = _env.PROXY
 
 # Telethon User API credentials
 # Получите API ID и API Hash на https://my.telegram.org
 # Установите значения в .env файле
-TELETHON_API_ID = int(os.getenv("TELETHON_API_ID", "0"))
-TELETHON_API_HASH = os.getenv("TELETHON_API_HASH", "")
-TELETHON_PHONE = os.getenv("TELETHON_PHONE", "")
-TELETHON_SESSION = os.getenv("TELETHON_SESSION", "")
+TELETHON_API_ID = _env.TELETHON_API_ID
+TELETHON_API_HASH = _env.TELETHON_API_HASH
+TELETHON_PHONE = _env.TELETHON_PHONE
+TELETHON_SESSION = _env.TELETHON_SESSION
 
 # ID владельца бота (для доступа к приватным функциям)
 OWNER_ID = 382202500
@@ -35,14 +59,23 @@ REQUIRED_CHANNEL_ID = -1001510749345
 
 # Директории
 BASE_DIR = Path(__file__).parent
-AUDIO_DIR = BASE_DIR / "audio"
+# Директорию аудио можно вынести на tmpfs (например, /dev/shm/tts_audio): файлы
+# синтеза пишутся и читаются при загрузке в Telegram без обращения к диску.
+# Кэш озвучек при этом не переживает перезагрузку, объем ограничен MAX_STORAGE_MB
+AUDIO_DIR = Path(_env.AUDIO_DIR) if _env.AUDIO_DIR else BASE_DIR / "audio"
 DB_PATH = BASE_DIR / "bot_history.db"
+# Абсолютный путь строкой: вычисляется один раз и используется в URL движка и sqlite3.connect
+DB_PATH_STR: str = str(DB_PATH.resolve())
 
 # TTS настройки
 TTS_VOICE = "ru-RU-DmitryNeural"
 TTS_RATE = "+50%"
 TTS_PITCH = "+0Hz"
 
+# Сколько озвучек сообщений каналов/чатов синтезируется одновременно (на весь бот).
+# Загрузка готового аудио в Telegram в этот лимит не входит
+TTS_CONCURRENCY = _env.TTS_CONCURRENCY
+
 # Доступные голоса для выбора пользователем
 AVAILABLE_VOICES = {
     "ru-RU-DmitryNeural": {
@@ -78,6 +111,21 @@ AVAILABLE_DURATIONS = {
     None: "♾️ Без лимита"
 }
 
+# Справочники только для чтения: на их основе один раз собираются клавиатуры
+# настроек, а ключи используются для проверки значений из callback_data
+AVAILABLE_VOICES = MappingProxyType(AVAILABLE_VOICES)
+AVAILABLE_RATES = MappingProxyType(AVAILABLE_RATES)
+AVAILABLE_DURATIONS = MappingProxyType(AVAILABLE_DURATIONS)
+
+AVAILABLE_VOICE_KEYS = frozenset(AVAILABLE_VOICES)
+AVAILABLE_RATE_KEYS = frozenset(AVAILABLE_RATES)
+AVAILABLE_DURATION_KEYS = frozenset(AVAILABLE_DURATIONS)
+
+# Отображаемые названия голосов: ID голоса -> "👨 Дмитрий (мужской)"
+VOICE_DISPLAY_NAMES = MappingProxyType({
+    voice_id: voice_info["name"] for voice_id, voice_info in AVAILABLE_VOICES.items()
+})
+
 # Длительность по умолчанию (None = без лимита)
 DEFAULT_MAX_DURATION_MINUTES = None
 
@@ -85,7 +133,7 @@ DEFAULT_MAX_DURATION_MINUTES = None
 MAX_STORAGE_MB = 300
 
 # Сообщения
-WELCOME_MESSAGE = """
+WELCOME_TEMPLATE = """
 👋 Привет! Я бот для озвучивания текста.
 
 Я могу:
@@ -97,6 +145,12 @@ WELCOME_MESSAGE = """
 
 ⚙️ Голос: {voice}
 ⚡ Скорость: {rate}
-""".format(voice=TTS_VOICE, rate=TTS_RATE)
+"""
+
+
+@lru_cache(maxsize=32)
+def welcome_for(voice: str, rate: str) -> str:
+    """Возвращает приветствие с настройками пользователя (кэшируется по паре голос/скорость)."""
+    return WELCOME_TEMPLATE.format(voice=voice, rate=rate)
 
 PROCESSING_MESSAGE = "⏳ Обрабатываю... Это может занять некоторое время."
@@ -2,14 +2,64 @@
 Настройка базы данных для Telegram Bot
 """
 
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select, insert, delete, func, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from models import Base
-from config import DB_PATH
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from models import (
+    Base,
+    Request,
+    TrackedChannel,
+    TrackedChat,
+    VoicedMessage,
+    UserSettings,
+    WhitelistedUser
+)
+from config import DB_PATH_STR, TTS_VOICE, TTS_RATE, DEFAULT_MAX_DURATION_MINUTES
+from migrate import run_migrations
+
+logger = logging.getLogger(__name__)
 
 
+# PRAGMA, применяемые к каждому новому соединению SQLite:
+# WAL + NORMAL позволяют читать во время записи и не делать fsync на каждый commit,
+# busy_timeout избавляет от "database is locked" при конкурентных обработчиках
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA busy_timeout=5000",
+)
+
 # Создаем async engine для SQLite
-DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
-engine = create_async_engine(DATABASE_URL, echo=False)
+# Пул соединений: обработчики переиспользуют "теплые" соединения с заполненным
+# кэшем страниц вместо открытия нового соединения на каждый запрос
+DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH_STR}"
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=5,
+    max_overflow=10,
+    pool_pre_ping=False,
+    pool_recycle=3600
+)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Настраивает каждое новое соединение SQLite."""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
 
 # Создаем фабрику сессий
 async_session_factory = async_sessionmaker(
@@ -18,11 +68,45 @@ async_session_factory = async_sessionmaker(
     expire_on_commit=False
 )
 
+# Фабрика для пишущих хелперов (фоновая запись, UPSERT подписок): они не читают
+# объекты через сессию, поэтому autoflush перед запросами не нужен
+write_session_factory = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+)
+
+
+def _create_missing_indexes(sync_conn):
+    """
+    Создает индексы, добавленные в модели после создания таблиц.
+    create_all не трогает уже существующие таблицы, поэтому для старых БД
+    индексы (в т.ч. уникальные, нужные для UPSERT) создаются отдельно.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
 
 async def init_db():
-    """Инициализирует базу данных, создает таблицы."""
+    """Инициализирует базу данных, создает таблицы и запускает фоновую запись."""
+    global _write_queue, _writer_task
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+    # Разовые исправления данных (применяются только новые версии). Выполняются
+    # до создания недостающих индексов: уникальные индексы требуют данных без дубликатов
+    await asyncio.to_thread(run_migrations)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_missing_indexes)
+
+    if _writer_task is None:
+        _write_queue = asyncio.Queue()
+        _writer_task = asyncio.create_task(_writer_loop())
+
     print("[DB] База данных инициализирована")
 
 
@@ -32,6 +116,131 @@ async def get_session() -> AsyncSession:
         yield session
 
 
+# Фабрика коротких сессий для read-only запросов (get_tracked_*, last voiced id,
+# whitelist): каждое чтение берет свое соединение из пула, поэтому чтения разных
+# обработчиков идут параллельно (WAL допускает одновременных читателей)
+readonly_session_factory = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
+)
+
+
+async def _read_scalars(stmt) -> list:
+    """
+    Выполняет SELECT в отдельной короткой сессии и возвращает список скаляров.
+
+    Закрытие сессии отсоединяет объекты без "просрочки" атрибутов,
+    а соединение возвращается в пул.
+    """
+    async with readonly_session_factory() as session:
+        result = await session.execute(stmt)
+        return result.scalars().all()
+
+
+async def _read_rows(stmt) -> list:
+    """Выполняет SELECT в отдельной короткой сессии и возвращает список кортежей."""
+    async with readonly_session_factory() as session:
+        result = await session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+
+# ===== ФОНОВАЯ ПАКЕТНАЯ ЗАПИСЬ =====
+# Вставки из обработчиков складываются в очередь, а одна фоновая задача
+# коммитит их пачками: N строк = 1 транзакция вместо N отдельных commit
+
+WRITE_BATCH_SIZE = 200
+
+_write_queue: Optional[asyncio.Queue] = None
+_writer_task: Optional[asyncio.Task] = None
+
+
+async def _writer_loop():
+    """Забирает строки из очереди и сохраняет их пачками в одной транзакции."""
+    while True:
+        batch = [await _write_queue.get()]
+        while not _write_queue.empty() and len(batch) < WRITE_BATCH_SIZE:
+            batch.append(_write_queue.get_nowait())
+
+        # Группируем по таблицам: один executemany на таблицу
+        rows_by_model = {}
+        for model, rows, _ in batch:
+            rows_by_model.setdefault(model, []).extend(rows)
+
+        error = None
+        try:
+            async with write_session_factory() as session:
+                for model, model_rows in rows_by_model.items():
+                    await session.execute(insert(model), model_rows)
+                await session.commit()
+        except Exception as e:
+            error = e
+            logger.error("Ошибка при пакетной записи в БД (%s записей): %s", len(batch), e)
+
+        for _, _, committed in batch:
+            if committed is not None and not committed.done():
+                if error is None:
+                    committed.set_result(None)
+                else:
+                    committed.set_exception(error)
+            _write_queue.task_done()
+
+
+async def _enqueue_write(model: type[Base], values: dict, wait: bool = False):
+    """
+    Ставит строку в очередь фоновой записи.
+
+    Строки вставляются через Core insert() без ORM объектов: обратно они
+    не читаются, поэтому unit-of-work и identity map не нужны.
+
+    Args:
+        model: ORM модель (таблица) для вставки
+        values: Значения колонок
+        wait: Дождаться коммита (для строк, которые сразу же читаются обратно)
+    """
+    await _enqueue_write_many(model, [values], wait=wait)
+
+
+async def _enqueue_write_many(model: type[Base], rows: List[dict], wait: bool = False):
+    """
+    Ставит несколько строк одной записью в очередь: они гарантированно
+    попадают в одну транзакцию и один executemany.
+    """
+    if not rows:
+        return
+
+    if _writer_task is None:
+        # Фоновая запись не запущена (init_db не вызывался) - пишем напрямую
+        async with write_session_factory() as session:
+            await session.execute(insert(model), rows)
+            await session.commit()
+        return
+
+    committed = asyncio.get_running_loop().create_future() if wait else None
+    await _write_queue.put((model, rows, committed))
+
+    if committed is not None:
+        await committed
+
+
+async def close_db():
+    """Дописывает очередь и закрывает соединения пула."""
+    global _write_queue, _writer_task
+
+    if _writer_task is not None:
+        await _write_queue.join()
+        _writer_task.cancel()
+        try:
+            await _writer_task
+        except asyncio.CancelledError:
+            pass
+        _writer_task = None
+        _write_queue = None
+
+    await engine.dispose()
+
+
 async def save_request(
     user_id: int,
     username: str,
@@ -53,62 +262,76 @@ async def save_request(
         status: Статус обработки ('success', 'error')
         error_message: Сообщение об ошибке (если есть)
     """
-    from models import Request
-
-    async with async_session_factory() as session:
-        request = Request(
-            user_id=user_id,
-            username=username,
-            request_type=request_type,
-            content=content,
-            audio_path=audio_path,
-            status=status,
-            error_message=error_message
-        )
-        session.add(request)
-        await session.commit()
+    # История запросов не читается обратно - не ждем коммита
+    await _enqueue_write(Request, {
+        "user_id": user_id,
+        "username": username,
+        "request_type": request_type,
+        "content": content,
+        "audio_path": audio_path,
+        "status": status,
+        "error_message": error_message
+    })
 
 
 # CRUD функции для отслеживания каналов и чатов
 
+# Кэш списков отслеживаемых источников: {(user_id, kind): (expires_at, rows)}.
+# Списки меняются только в add_tracked_*, где запись и сбрасывается
+TRACKED_CACHE_TTL = 30.0
+
+_tracked_cache: dict = {}
+
+
+def _get_cached_tracked(user_id: int, kind: str) -> Optional[list]:
+    """Возвращает закэшированный список источников или None, если запись устарела."""
+    entry = _tracked_cache.get((user_id, kind))
+    if entry is None:
+        return None
+
+    expires_at, rows = entry
+    if expires_at < time.monotonic():
+        del _tracked_cache[(user_id, kind)]
+        return None
+
+    return list(rows)
+
+
+def invalidate_tracked_cache(user_id: int, kind: str):
+    """Сбрасывает кэш списка источников пользователя ('channel' или 'chat')."""
+    _tracked_cache.pop((user_id, kind), None)
+
+
 async def add_tracked_channel(
     user_id: int,
     channel_username: str,
     channel_id: int = None,
     channel_title: str = None
 ):
-    """Добавляет канал в отслеживаемые."""
-    from models import TrackedChannel
-    from sqlalchemy import select
-
-    async with async_session_factory() as session:
-        # Проверяем, не добавлен ли уже
-        stmt = select(TrackedChannel).where(
-            TrackedChannel.user_id == user_id,
-            TrackedChannel.channel_username == channel_username
-        )
-        result = await session.execute(stmt)
-        existing = result.scalar_one_or_none()
-
-        if existing:
-            # Обновляем существующий
-            existing.is_active = True
-            if channel_id:
-                existing.channel_id = channel_id
-            if channel_title:
-                existing.channel_title = channel_title
-        else:
-            # Создаем новый
-            channel = TrackedChannel(
-                user_id=user_id,
-                channel_username=channel_username,
-                channel_id=channel_id,
-                channel_title=channel_title
-            )
-            session.add(channel)
-
+    """Добавляет канал в отслеживаемые (или реактивирует существующий)."""
+    stmt = sqlite_insert(TrackedChannel).values(
+        user_id=user_id,
+        channel_username=channel_username,
+        channel_id=channel_id,
+        channel_title=channel_title
+    )
+    # Один UPSERT вместо SELECT + INSERT/UPDATE.
+    # Пустые значения не затирают уже сохраненные данные
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "channel_username"],
+        set_={
+            "is_active": True,
+            "channel_id": func.coalesce(stmt.excluded.channel_id, TrackedChannel.channel_id),
+            "channel_title": func.coalesce(stmt.excluded.channel_title, TrackedChannel.channel_title)
+        }
+    )
+
+    async with write_session_factory() as session:
+        await session.execute(stmt)
         await session.commit()
 
+    invalidate_tracked_cache(user_id, 'channel')
+
 
 async def add_tracked_chat(
     user_id: int,
@@ -116,65 +339,90 @@ async def add_tracked_chat(
     chat_username: str = None,
     chat_title: str = None
 ):
-    """Добавляет чат в отслеживаемые."""
-    from models import TrackedChat
-    from sqlalchemy import select
-
-    async with async_session_factory() as session:
-        # Проверяем, не добавлен ли уже
-        stmt = select(TrackedChat).where(
-            TrackedChat.user_id == user_id,
-            TrackedChat.chat_id == chat_id
-        )
-        result = await session.execute(stmt)
-        existing = result.scalar_one_or_none()
-
-        if existing:
-            # Обновляем существующий
-            existing.is_active = True
-            if chat_username:
-                existing.chat_username = chat_username
-            if chat_title:
-                existing.chat_title = chat_title
-        else:
-            # Создаем новый
-            chat = TrackedChat(
-                user_id=user_id,
-                chat_id=chat_id,
-                chat_username=chat_username,
-                chat_title=chat_title
-            )
-            session.add(chat)
-
+    """Добавляет чат в отслеживаемые (или реактивирует существующий)."""
+    stmt = sqlite_insert(TrackedChat).values(
+        user_id=user_id,
+        chat_id=chat_id,
+        chat_username=chat_username,
+        chat_title=chat_title
+    )
+    # Один UPSERT вместо SELECT + INSERT/UPDATE.
+    # Пустые значения не затирают уже сохраненные данные
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "chat_id"],
+        set_={
+            "is_active": True,
+            "chat_username": func.coalesce(stmt.excluded.chat_username, TrackedChat.chat_username),
+            "chat_title": func.coalesce(stmt.excluded.chat_title, TrackedChat.chat_title)
+        }
+    )
+
+    async with write_session_factory() as session:
+        await session.execute(stmt)
         await session.commit()
 
+    invalidate_tracked_cache(user_id, 'chat')
+
 
 async def get_tracked_channels(user_id: int):
     """Возвращает список отслеживаемых каналов пользователя."""
-    from models import TrackedChannel
-    from sqlalchemy import select
+    cached = _get_cached_tracked(user_id, 'channel')
+    if cached is not None:
+        return cached
 
-    async with async_session_factory() as session:
-        stmt = select(TrackedChannel).where(
-            TrackedChannel.user_id == user_id,
-            TrackedChannel.is_active == True
-        )
-        result = await session.execute(stmt)
-        return result.scalars().all()
+    stmt = select(TrackedChannel).where(
+        TrackedChannel.user_id == user_id,
+        TrackedChannel.is_active == True
+    )
+    rows = await _read_scalars(stmt)
+    _tracked_cache[(user_id, 'channel')] = (time.monotonic() + TRACKED_CACHE_TTL, rows)
+    return list(rows)
 
 
 async def get_tracked_chats(user_id: int):
     """Возвращает список отслеживаемых чатов пользователя."""
-    from models import TrackedChat
-    from sqlalchemy import select
+    cached = _get_cached_tracked(user_id, 'chat')
+    if cached is not None:
+        return cached
+
+    stmt = select(TrackedChat).where(
+        TrackedChat.user_id == user_id,
+        TrackedChat.is_active == True
+    )
+    rows = await _read_scalars(stmt)
+    _tracked_cache[(user_id, 'chat')] = (time.monotonic() + TRACKED_CACHE_TTL, rows)
+    return list(rows)
+
+
+async def iter_tracked_channels(user_id: int) -> AsyncIterator[TrackedChannel]:
+    """
+    Потоково отдает отслеживаемые каналы пользователя, не собирая их в список.
+
+    Использует отдельную сессию (а не общую read-only), поэтому внутри
+    цикла можно вызывать другие функции чтения.
+    """
+    stmt = select(TrackedChannel).where(
+        TrackedChannel.user_id == user_id,
+        TrackedChannel.is_active == True
+    ).execution_options(yield_per=50)
 
     async with async_session_factory() as session:
-        stmt = select(TrackedChat).where(
-            TrackedChat.user_id == user_id,
-            TrackedChat.is_active == True
-        )
-        result = await session.execute(stmt)
-        return result.scalars().all()
+        result = await session.stream_scalars(stmt)
+        async for channel in result:
+            yield channel
+
+
+async def iter_tracked_chats(user_id: int) -> AsyncIterator[TrackedChat]:
+    """Потоково отдает отслеживаемые чаты пользователя (см. iter_tracked_channels)."""
+    stmt = select(TrackedChat).where(
+        TrackedChat.user_id == user_id,
+        TrackedChat.is_active == True
+    ).execution_options(yield_per=50)
+
+    async with async_session_factory() as session:
+        result = await session.stream_scalars(stmt)
+        async for chat in result:
+            yield chat
 
 
 async def save_voiced_message(
@@ -186,36 +434,150 @@ async def save_voiced_message(
     audio_path: str = None
 ):
     """Сохраняет информацию об озвученном сообщении."""
-    from models import VoicedMessage
+    # Ждем коммита: следующий /voice_new читает последний озвученный ID
+    await _enqueue_write(VoicedMessage, {
+        "user_id": user_id,
+        "source_type": source_type,
+        "source_id": source_id,
+        "message_id": message_id,
+        "message_text": message_text,
+        "audio_path": audio_path
+    }, wait=True)
+
+
+async def save_voiced_messages_bulk(rows: List[dict]):
+    """
+    Сохраняет несколько записей об озвученных сообщениях одной транзакцией.
 
-    async with async_session_factory() as session:
-        voiced_msg = VoicedMessage(
-            user_id=user_id,
-            source_type=source_type,
-            source_id=source_id,
-            message_id=message_id,
-            message_text=message_text,
-            audio_path=audio_path
-        )
-        session.add(voiced_msg)
-        await session.commit()
+    Args:
+        rows: Словари с полями save_voiced_message (user_id, source_type,
+              source_id, message_id, message_text, audio_path)
+    """
+    # Ждем коммита, как и в save_voiced_message
+    await _enqueue_write_many(VoicedMessage, rows, wait=True)
 
 
-async def get_last_voiced_message_id(user_id: int, source_type: str, source_id: int):
-    """Возвращает ID последнего озвученного сообщения для источника."""
-    from models import VoicedMessage
-    from sqlalchemy import select, desc
+async def get_last_voiced_message_ids(user_id: int, sources: List[Tuple[str, int]]) -> Dict[Tuple[str, int], int]:
+    """
+    Возвращает ID последних озвученных сообщений сразу для нескольких источников.
 
-    async with async_session_factory() as session:
-        stmt = select(VoicedMessage.message_id).where(
-            VoicedMessage.user_id == user_id,
-            VoicedMessage.source_type == source_type,
-            VoicedMessage.source_id == source_id
-        ).order_by(desc(VoicedMessage.message_id)).limit(1)
+    Один GROUP BY запрос вместо отдельного запроса MAX(message_id) на источник.
 
-        result = await session.execute(stmt)
-        last_id = result.scalar_one_or_none()
-        return last_id if last_id else 0
+    Args:
+        user_id: ID пользователя
+        sources: Список пар (source_type, source_id)
+
+    Returns:
+        Словарь {(source_type, source_id): message_id}; источников без
+        озвученных сообщений в словаре нет
+    """
+    if not sources:
+        return {}
+
+    stmt = select(
+        VoicedMessage.source_type,
+        VoicedMessage.source_id,
+        func.max(VoicedMessage.message_id)
+    ).where(
+        VoicedMessage.user_id == user_id,
+        tuple_(VoicedMessage.source_type, VoicedMessage.source_id).in_(sources)
+    ).group_by(VoicedMessage.source_type, VoicedMessage.source_id)
+
+    rows = await _read_rows(stmt)
+    return {(source_type, source_id): last_id for source_type, source_id, last_id in rows}
+
+
+# Кэш настроек синтеза: {user_id: (expires_at, (голос, скорость, лимит))}.
+# Настройки меняются только в set_user_*, где запись и сбрасывается;
+# TTL ограничивает устаревание при правке базы в обход бота
+USER_SETTINGS_CACHE_TTL = 60.0
+USER_SETTINGS_CACHE_MAX_SIZE = 1024
+
+_user_settings_cache: dict = {}
+# Поколение настроек пользователя: увеличивается при каждом изменении, чтобы
+# чтение, начатое до изменения, не вернуло в кэш старые значения
+_user_settings_generation: Dict[int, int] = {}
+
+
+def invalidate_user_settings_cache(user_id: int):
+    """Сбрасывает закэшированные настройки синтеза пользователя."""
+    _user_settings_generation[user_id] = _user_settings_generation.get(user_id, 0) + 1
+    _user_settings_cache.pop(user_id, None)
+
+
+async def get_user_settings(user_id: int) -> Tuple[str, str, Optional[int]]:
+    """
+    Возвращает все настройки синтеза пользователя одним запросом.
+
+    Для обработчиков, которым нужны сразу голос, скорость и лимит длительности:
+    один SELECT вместо get_user_voice + get_user_rate + get_user_max_duration.
+    Результат кэшируется на USER_SETTINGS_CACHE_TTL секунд, поэтому пакетная
+    озвучка (/voice_new) обращается к базе один раз, а не на каждый источник.
+
+    Args:
+        user_id: ID пользователя
+
+    Returns:
+        Кортеж (голос, скорость речи, максимальная длительность в минутах или None);
+        для отсутствующих настроек - дефолтные значения из config
+    """
+    entry = _user_settings_cache.get(user_id)
+    if entry is not None and entry[0] >= time.monotonic():
+        return entry[1]
+
+    generation = _user_settings_generation.get(user_id, 0)
+
+    stmt = select(
+        UserSettings.voice_name,
+        UserSettings.speech_rate,
+        UserSettings.max_audio_duration_minutes
+    ).where(UserSettings.user_id == user_id)
+
+    rows = await _read_rows(stmt)
+    if not rows:
+        settings = (TTS_VOICE, TTS_RATE, DEFAULT_MAX_DURATION_MINUTES)
+    else:
+        voice_name, speech_rate, max_duration = rows[0]
+        settings = (voice_name, speech_rate or TTS_RATE, max_duration)
+
+    # Пока шел запрос, настройки могли измениться - такой результат не кэшируем
+    if _user_settings_generation.get(user_id, 0) != generation:
+        return settings
+
+    # Простое ограничение размера: при переполнении кэш очищается целиком
+    if len(_user_settings_cache) >= USER_SETTINGS_CACHE_MAX_SIZE:
+        _user_settings_cache.clear()
+    _user_settings_cache[user_id] = (time.monotonic() + USER_SETTINGS_CACHE_TTL, settings)
+    return settings
+
+
+async def _upsert_user_settings(user_id: int, **values):
+    """
+    Сохраняет одну или несколько настроек пользователя одним UPSERT.
+
+    Для нового пользователя остальные поля получают дефолтные значения из config,
+    у существующего меняются только переданные поля.
+    """
+    stmt = sqlite_insert(UserSettings).values(
+        user_id=user_id,
+        **{
+            "voice_name": TTS_VOICE,
+            "speech_rate": TTS_RATE,
+            "max_audio_duration_minutes": DEFAULT_MAX_DURATION_MINUTES,
+            **values
+        }
+    )
+    # Один запрос вместо SELECT + UPDATE/INSERT через ORM
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_={**values, "updated_at": datetime.utcnow()}
+    )
+
+    async with write_session_factory() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+    invalidate_user_settings_cache(user_id)
 
 
 async def get_user_voice(user_id: int) -> str:
@@ -228,20 +590,8 @@ async def get_user_voice(user_id: int) -> str:
     Returns:
         Название голоса или дефолтное значение
     """
-    from models import UserSettings
-    from sqlalchemy import select
-    from config import TTS_VOICE
-
-    async with async_session_factory() as session:
-        stmt = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await session.execute(stmt)
-        settings = result.scalar_one_or_none()
-
-        if settings:
-            return settings.voice_name
-        else:
-            # Возвращаем дефолтный голос из config
-            return TTS_VOICE
+    voice_name, _, _ = await get_user_settings(user_id)
+    return voice_name
 
 
 async def set_user_voice(user_id: int, voice_name: str):
@@ -252,32 +602,7 @@ async def set_user_voice(user_id: int, voice_name: str):
         user_id: ID пользователя
         voice_name: Название голоса (например, "ru-RU-DmitryNeural")
     """
-    from models import UserSettings
-    from sqlalchemy import select
-    from datetime import datetime
-    from config import TTS_RATE, DEFAULT_MAX_DURATION_MINUTES
-
-    async with async_session_factory() as session:
-        # Проверяем существование настроек
-        stmt = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await session.execute(stmt)
-        settings = result.scalar_one_or_none()
-
-        if settings:
-            # Обновляем существующие настройки
-            settings.voice_name = voice_name
-            settings.updated_at = datetime.utcnow()
-        else:
-            # Создаем новые настройки с дефолтными значениями для всех полей
-            settings = UserSettings(
-                user_id=user_id,
-                voice_name=voice_name,
-                speech_rate=TTS_RATE,
-                max_audio_duration_minutes=DEFAULT_MAX_DURATION_MINUTES
-            )
-            session.add(settings)
-
-        await session.commit()
+    await _upsert_user_settings(user_id, voice_name=voice_name)
 
 
 async def get_user_rate(user_id: int) -> str:
@@ -290,20 +615,8 @@ async def get_user_rate(user_id: int) -> str:
     Returns:
         Скорость речи (например, "+50%") или дефолтное значение
     """
-    from models import UserSettings
-    from sqlalchemy import select
-    from config import TTS_RATE
-
-    async with async_session_factory() as session:
-        stmt = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await session.execute(stmt)
-        settings = result.scalar_one_or_none()
-
-        if settings and settings.speech_rate:
-            return settings.speech_rate
-        else:
-            # Возвращаем дефолтную скорость из config
-            return TTS_RATE
+    _, speech_rate, _ = await get_user_settings(user_id)
+    return speech_rate
 
 
 async def set_user_rate(user_id: int, speech_rate: str):
@@ -314,32 +627,7 @@ async def set_user_rate(user_id: int, speech_rate: str):
         user_id: ID пользователя
         speech_rate: Скорость речи (например, "+50%")
     """
-    from models import UserSettings
-    from sqlalchemy import select
-    from datetime import datetime
-    from config import TTS_VOICE, DEFAULT_MAX_DURATION_MINUTES
-
-    async with async_session_factory() as session:
-        # Проверяем существование настроек
-        stmt = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await session.execute(stmt)
-        settings = result.scalar_one_or_none()
-
-        if settings:
-            # Обновляем существующие настройки
-            settings.speech_rate = speech_rate
-            settings.updated_at = datetime.utcnow()
-        else:
-            # Создаем новые настройки с дефолтными значениями для всех полей
-            settings = UserSettings(
-                user_id=user_id,
-                voice_name=TTS_VOICE,
-                speech_rate=speech_rate,
-                max_audio_duration_minutes=DEFAULT_MAX_DURATION_MINUTES
-            )
-            session.add(settings)
-
-        await session.commit()
+    await _upsert_user_settings(user_id, speech_rate=speech_rate)
 
 
 async def get_user_max_duration(user_id: int):
@@ -352,20 +640,8 @@ async def get_user_max_duration(user_id: int):
     Returns:
         Максимальная длительность в минутах или None (без лимита)
     """
-    from models import UserSettings
-    from sqlalchemy import select
-    from config import DEFAULT_MAX_DURATION_MINUTES
-
-    async with async_session_factory() as session:
-        stmt = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await session.execute(stmt)
-        settings = result.scalar_one_or_none()
-
-        if settings:
-            return settings.max_audio_duration_minutes
-        else:
-            # Возвращаем дефолтное значение из config
-            return DEFAULT_MAX_DURATION_MINUTES
+    _, _, max_duration = await get_user_settings(user_id)
+    return max_duration
 
 
 async def set_user_max_duration(user_id: int, max_duration_minutes: int):
@@ -376,32 +652,7 @@ async def set_user_max_duration(user_id: int, max_duration_minutes: int):
         user_id: ID пользователя
         max_duration_minutes: Максимальная длительность в минутах или None (без лимита)
     """
-    from models import UserSettings
-    from sqlalchemy import select
-    from datetime import datetime
-    from config import TTS_VOICE, TTS_RATE
-
-    async with async_session_factory() as session:
-        # Проверяем существование настроек
-        stmt = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await session.execute(stmt)
-        settings = result.scalar_one_or_none()
-
-        if settings:
-            # Обновляем существующие настройки
-            settings.max_audio_duration_minutes = max_duration_minutes
-            settings.updated_at = datetime.utcnow()
-        else:
-            # Создаем новые настройки с дефолтными значениями для всех полей
-            settings = UserSettings(
-                user_id=user_id,
-                voice_name=TTS_VOICE,
-                speech_rate=TTS_RATE,
-                max_audio_duration_minutes=max_duration_minutes
-            )
-            session.add(settings)
-
-        await session.commit()
+    await _upsert_user_settings(user_id, max_audio_duration_minutes=max_duration_minutes)
 
 
 # CRUD функции для работы с белым списком пользователей
@@ -416,14 +667,10 @@ async def is_user_whitelisted(user_id: int) -> bool:
     Returns:
         True если пользователь в белом списке, False иначе
     """
-    from models import WhitelistedUser
-    from sqlalchemy import select
-
-    async with async_session_factory() as session:
-        stmt = select(WhitelistedUser).where(WhitelistedUser.user_id == user_id)
-        result = await session.execute(stmt)
-        user = result.scalar_one_or_none()
-        return user is not None
+    # Проверка выполняется middleware на каждое обновление: читаем только id
+    # короткой read-only сессией, без загрузки ORM-объекта
+    stmt = select(WhitelistedUser.id).where(WhitelistedUser.user_id == user_id).limit(1)
+    return bool(await _read_scalars(stmt))
 
 
 async def add_whitelisted_user(
@@ -443,9 +690,6 @@ async def add_whitelisted_user(
         first_name: Имя пользователя (опционально)
         last_name: Фамилия пользователя (опционально)
     """
-    from models import WhitelistedUser
-    from sqlalchemy import select
-
     async with async_session_factory() as session:
         # Проверяем, не добавлен ли уже
         stmt = select(WhitelistedUser).where(WhitelistedUser.user_id == user_id)
@@ -482,9 +726,6 @@ async def remove_whitelisted_user(identifier: str):
     Returns:
         True если пользователь был удален, False если не найден
     """
-    from models import WhitelistedUser
-    from sqlalchemy import select, delete
-
     async with async_session_factory() as session:
         # Пробуем интерпретировать как ID
         try:
@@ -508,9 +749,6 @@ async def get_all_whitelisted_users():
     Returns:
         List[WhitelistedUser]
     """
-    from models import WhitelistedUser
-    from sqlalchemy import select
-
     async with async_session_factory() as session:
         stmt = select(WhitelistedUser).order_by(WhitelistedUser.created_at.desc())
         result = await session.execute(stmt)
@@ -2,56 +2,70 @@
 Обработчики команд и сообщений Telegram Bot
 """
 
-import os
-import sys
 import asyncio
+import io
 import logging
+import os
 import shutil
-from pathlib import Path
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import aiofiles.os
 
 from aiogram import Router, F
-from aiogram.filters import Command, StateFilter
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import (
     Message,
+    BufferedInputFile,
     FSInputFile,
+    InputMediaAudio,
     CallbackQuery
 )
 from aiogram.enums import ChatAction
-from aiogram.exceptions import TelegramBadRequest
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 import re
 
 # Логгер для handlers
 logger = logging.getLogger(__name__)
 
-# Добавляем путь к tts_common
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from tts_common import (
     synthesize_text,
-    synthesize_text_with_duration_limit,
-    parse_document,
+    synthesize_text_to_bytes,
+    synthesize_texts_merged,
+    parse_document_bytes,
     parse_url,
     is_valid_url,
     StorageManager,
+    TTSCache,
+    tts_cache_key,
     sanitize_filename,
     generate_filename_from_text,
     estimate_duration_minutes,
     format_duration_display,
     calculate_parts_info
 )
-from tts_common.document_parser import SUPPORTED_EXTENSIONS
+from tts_common.document_parser import SUPPORTED_EXTENSIONS_SET, SUPPORTED_EXTENSIONS_TEXT
+from tts_common.tts_service import CHUNK_CHAR_LIMIT
 
 from config import (
-    WELCOME_MESSAGE,
+    welcome_for,
     PROCESSING_MESSAGE,
     AUDIO_DIR,
     TTS_VOICE,
     TTS_RATE,
     TTS_PITCH,
+    TTS_CONCURRENCY,
     MAX_STORAGE_MB,
     OWNER_ID,
-    AVAILABLE_VOICES
+    AVAILABLE_RATES,
+    AVAILABLE_DURATIONS,
+    AVAILABLE_VOICE_KEYS,
+    AVAILABLE_RATE_KEYS,
+    AVAILABLE_DURATION_KEYS,
+    VOICE_DISPLAY_NAMES
 )
 from database import (
     save_request,
@@ -59,8 +73,12 @@ from database import (
     add_tracked_chat,
     get_tracked_channels,
     get_tracked_chats,
+    iter_tracked_channels,
+    iter_tracked_chats,
     save_voiced_message,
-    get_last_voiced_message_id,
+    save_voiced_messages_bulk,
+    get_last_voiced_message_ids,
+    get_user_settings,
     get_user_voice,
     set_user_voice,
     get_user_rate,
@@ -88,77 +106,525 @@ from states import AddChannelStates, AddChatStates
 # Создаем роутер
 router = Router()
 
+# Шаги диалогов добавления канала и чата живут в отдельных роутерах с фильтром
+# состояния на уровне роутера: вне диалога aiogram пропускает их целиком,
+# не проверяя фильтры каждого обработчика
+add_channel_router = Router(name="add_channel")
+add_channel_router.message.filter(StateFilter(AddChannelStates))
+add_chat_router = Router(name="add_chat")
+add_chat_router.message.filter(StateFilter(AddChatStates))
+router.include_routers(add_channel_router, add_chat_router)
+
 # Инициализируем менеджер хранилища
 storage_manager = StorageManager(str(AUDIO_DIR), MAX_STORAGE_MB)
 
+# Кэш синтезированного аудио в той же директории: повторный текст с теми же
+# настройками отправляется без синтеза, вытеснение - через storage_manager
+tts_cache = TTSCache(storage_manager)
+
+# Разбор PDF/DOCX нагружает CPU и держит GIL - выполняем его в отдельных процессах,
+# чтобы один тяжелый документ не останавливал обработку остальных пользователей
+PARSE_DOCUMENT_TIMEOUT = 60
+PARSE_POOL_WORKERS = 2
+
+# Пул создается при первом документе, а не при импорте модуля
+_parse_pool: ProcessPoolExecutor | None = None
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    """Возвращает пул процессов разбора документов, создавая его при первом обращении."""
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_POOL_WORKERS)
+    return _parse_pool
+
+
+def _discard_parse_pool(pool: ProcessPoolExecutor):
+    """
+    Убивает процессы пула и забывает его: следующий документ получит новый пул.
+
+    Отмена future по таймауту не останавливает зависший разбор в процессе,
+    а упавший процесс делает пул непригодным (BrokenProcessPool) навсегда.
+    """
+    global _parse_pool
+    if _parse_pool is pool:
+        _parse_pool = None
+    # У ProcessPoolExecutor нет публичного способа убить занятые процессы (до Python 3.14)
+    for process in list((pool._processes or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def parse_document_in_pool(data: bytes, file_name: str) -> str:
+    """
+    Разбирает документ в пуле процессов с ограничением по времени.
+
+    Зависший разбор убивается вместе с пулом. Если пул сломался из-за чужого
+    документа (процесс упал или был убит по таймауту), разбор повторяется
+    один раз в новом пуле.
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = _get_parse_pool()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(pool, parse_document_bytes, data, file_name),
+                timeout=PARSE_DOCUMENT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            _discard_parse_pool(pool)
+            raise Exception(f"Документ обрабатывается слишком долго (более {PARSE_DOCUMENT_TIMEOUT} с)")
+        except BrokenProcessPool:
+            _discard_parse_pool(pool)
+            if attempt:
+                raise Exception("Процесс разбора документа аварийно завершился")
+            logger.warning("Пул разбора документов сломан, повторяем разбор %s в новом пуле", file_name)
+
+
+def shutdown_parse_pool():
+    """Останавливает пул процессов разбора документов (вызывается при остановке бота)."""
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+
+
+# FSInputFile уже отдает файл потоково через aiofiles; каждый read - это переход
+# в пул потоков, поэтому читаем крупными блоками вместо стандартных 64 КБ
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def audio_input_file(path, filename: str = None) -> FSInputFile:
+    """Создает файл для потоковой загрузки аудио в Telegram."""
+    return FSInputFile(path, filename=filename, chunk_size=UPLOAD_CHUNK_SIZE)
+
+
+async def edit_or_answer(message: Message, text: str, **kwargs) -> None:
+    """
+    Редактирует сообщение бота, а если это невозможно - отправляет новое.
+
+    Повторное нажатие той же кнопки не тратит запрос к Telegram: если текст
+    и клавиатура совпадают с текущими, сообщение не редактируется. Ответ
+    "message is not modified" тоже не приводит к отправке дубликата.
+    """
+    if (
+        message.html_text.strip() == text.strip()
+        and message.reply_markup == kwargs.get("reply_markup")
+    ):
+        return
+
+    try:
+        await message.edit_text(text, **kwargs)
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            return
+        # Если не удалось отредактировать, отправляем новое
+        await message.answer(text, **kwargs)
+
+
+async def remove_file_quietly(path) -> None:
+    """Удаляет файл, не блокируя event loop; отсутствие файла не считается ошибкой."""
+    try:
+        await aiofiles.os.remove(path)
+    except OSError:
+        pass
+
+
+# ===== HELPER КЛАСС ДЛЯ РЕДАКТИРОВАНИЯ СТАТУСА =====
+
+# Минимальный интервал между правками одного статусного сообщения (секунды)
+STATUS_EDIT_INTERVAL = 0.75
+
+
+class DebouncedEditor:
+    """
+    Редактирует статусное сообщение не чаще раза в STATUS_EDIT_INTERVAL секунд.
+
+    Тексты, пришедшие внутри окна, схлопываются: по его истечении отправляется
+    только последний из них. Повторная отправка того же текста пропускается.
+    Повторяет интерфейс Message.edit_text, поэтому передается вместо status_msg.
+    """
+
+    def __init__(self, message: Message, interval: float = STATUS_EDIT_INTERVAL):
+        self.message = message
+        self.interval = interval
+        self._last_edit_at = 0.0
+        self._last_text = None
+        self._pending_text = None
+        self._pending_task: asyncio.Task = None
+
+    async def edit_text(self, text: str):
+        """Планирует правку статуса (сразу, если окно уже прошло)."""
+        self._pending_text = text
+        if self._pending_task is not None:
+            return  # Отложенная правка уже запланирована и возьмет последний текст
+
+        delay = self._last_edit_at + self.interval - asyncio.get_running_loop().time()
+        if delay <= 0:
+            await self._apply()
+        else:
+            self._pending_task = asyncio.create_task(self._apply_later(delay))
+
+    async def _apply_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._pending_task = None
+        await self._apply()
+
+    async def _apply(self):
+        text, self._pending_text = self._pending_text, None
+        if text is None or text == self._last_text:
+            return
+
+        self._last_text = text
+        self._last_edit_at = asyncio.get_running_loop().time()
+        try:
+            await self.message.edit_text(text)
+        except TelegramBadRequest:
+            pass
+
+    async def flush(self):
+        """Немедленно применяет отложенную правку (вызывается по завершении этапа)."""
+        self.cancel()
+        await self._apply()
+
+    def cancel(self):
+        """Отменяет отложенную правку, например перед финальным сообщением вызывающего кода."""
+        if self._pending_task is not None:
+            self._pending_task.cancel()
+            self._pending_task = None
+
 
 # ===== HELPER КЛАСС ДЛЯ УПОРЯДОЧЕННОЙ ОТПРАВКИ ЧАСТЕЙ =====
 
+# Telegram принимает в одной медиагруппе от 2 до 10 аудио
+MEDIA_GROUP_MAX_SIZE = 10
+
 
 class OrderedPartSender:
     """
     Класс для упорядоченной отправки частей аудио по мере их готовности.
     Гарантирует, что части отправляются в правильном порядке (1, 2, 3, ...),
     даже если они готовятся параллельно и в произвольном порядке.
+
+    Готовые части складываются в очередь, отправляет их отдельная задача:
+    синтез следующих частей не ждет загрузки предыдущих в Telegram.
+    Несколько готовых подряд частей (например, из кэша) уходят одной медиагруппой:
+    один запрос вместо нескольких, порядок в чате сохраняется.
+    После синтеза нужно дождаться отправки через join().
     """
 
-    def __init__(self, message: Message, total_parts: int, title_formatter):
+    def __init__(self, message: Message, total_parts: int, title_formatter, delete_after_send: bool = True):
         """
         Args:
             message: Сообщение для отправки аудио
             total_parts: Общее количество частей
             title_formatter: Функция для форматирования названия (part_num, total_parts) -> str
+            delete_after_send: Удалять файл части после отправки (False для файлов из кэша)
         """
         self.message = message
         self.total_parts = total_parts
         self.title_formatter = title_formatter
+        self.delete_after_send = delete_after_send
         self.next_to_send = 1  # Следующий номер части для отправки
         self.ready_parts = {}  # Словарь {part_num: file_path} готовых, но ещё не отправленных частей
-        self.lock = asyncio.Lock()  # Для thread-safe доступа
+        self._queue: asyncio.Queue = asyncio.Queue()  # (part_num, file_path); None - конец синтеза
+        self._task = asyncio.create_task(self._drain())
 
     async def on_part_ready(self, part_num: int, file_path: str, total_parts: int):
         """
         Callback, вызываемый когда часть готова.
-        Отправляет часть если она следующая по порядку, или сохраняет для последующей отправки.
+        Только ставит часть в очередь отправки и сразу возвращает управление.
         """
-        async with self.lock:
-            # Сохраняем готовую часть
+        print(f"✅ Часть {part_num}/{total_parts} готова к отправке")
+        self._queue.put_nowait((part_num, file_path))
+
+    async def join(self):
+        """Дожидается отправки всех готовых частей (вызывается после завершения синтеза)."""
+        if not self._task.done():
+            self._queue.put_nowait(None)
+        await self._task
+
+    async def _drain(self):
+        """Единственный потребитель очереди: отправляет части строго по порядку."""
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            part_num, file_path = item
             self.ready_parts[part_num] = file_path
-            print(f"✅ Часть {part_num}/{total_parts} готова к отправке")
+
+            # Забираем из очереди все, что уже готово, чтобы отправить одной группой
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    self._queue.put_nowait(None)
+                    break
+                self.ready_parts[item[0]] = item[1]
 
             # Отправляем все части которые готовы и идут по порядку
             while self.next_to_send in self.ready_parts:
-                current_part = self.next_to_send
-                current_file = self.ready_parts.pop(current_part)
-
-                # Формируем название
-                title = self.title_formatter(current_part, self.total_parts)
-
-                # Отправляем
-                try:
-                    audio_file = FSInputFile(current_file)
-                    await self.message.answer_audio(
-                        audio_file,
-                        title=title,
+                batch = []
+                while self.next_to_send in self.ready_parts and len(batch) < MEDIA_GROUP_MAX_SIZE:
+                    batch.append((self.next_to_send, self.ready_parts.pop(self.next_to_send)))
+                    self.next_to_send += 1
+                await self._send(batch)
+
+    async def _with_retry_after(self, send):
+        """Выполняет отправку, один раз переждав RetryAfter (flood control Telegram)."""
+        try:
+            await send()
+        except TelegramRetryAfter as e:
+            logger.warning("Flood control: ожидание %s с перед повторной отправкой", e.retry_after)
+            await asyncio.sleep(e.retry_after)
+            await send()
+
+    async def _send_audio(self, part_num: int, file_path: str):
+        await self._with_retry_after(lambda: self.message.answer_audio(
+            audio_input_file(file_path),
+            title=self.title_formatter(part_num, self.total_parts),
+            performer="MKttsBOT"
+        ))
+
+    async def _send(self, batch: list):
+        """Отправляет части [(part_num, file_path), ...]: одну - аудио, несколько - медиагруппой."""
+        parts_label = ", ".join(str(part_num) for part_num, _ in batch)
+        sent = False
+        if len(batch) > 1:
+            try:
+                await self._with_retry_after(lambda: self.message.answer_media_group([
+                    InputMediaAudio(
+                        media=audio_input_file(file_path),
+                        title=self.title_formatter(part_num, self.total_parts),
                         performer="MKttsBOT"
                     )
-                    print(f"📤 Часть {current_part}/{self.total_parts} отправлена")
-
-                    # Удаляем файл сразу после отправки
-                    try:
-                        os.remove(current_file)
-                    except OSError:
-                        pass
+                    for part_num, file_path in batch
+                ]))
+                sent = True
+                print(f"📤 Части {parts_label}/{self.total_parts} отправлены")
+            except Exception as e:
+                # Одна неподходящая часть или сбой не должны терять всю группу:
+                # отправляем части по одной
+                logger.warning("Не удалось отправить части %s группой, отправляем по одной: %s", parts_label, e)
+
+        if not sent:
+            for part_num, file_path in batch:
+                try:
+                    await self._send_audio(part_num, file_path)
+                    print(f"📤 Часть {part_num}/{self.total_parts} отправлена")
                 except Exception as e:
-                    logger.error(f"Ошибка при отправке части {current_part}: {e}")
+                    logger.error("Ошибка при отправке части %s: %s", part_num, e)
+
+        # Удаляем файлы сразу после отправки
+        if self.delete_after_send:
+            for _, file_path in batch:
+                await remove_file_quietly(file_path)
 
-                self.next_to_send += 1
+
+# ===== ОБЩИЙ КОНВЕЙЕР СИНТЕЗА И ОТПРАВКИ =====
+
+# Минимум свободного места на диске для запуска синтеза
+MIN_FREE_DISK_BYTES = 300_000_000
+
+# Свободное место меняется медленно: statfs выполняется не чаще раза в DISK_USAGE_TTL секунд
+DISK_USAGE_TTL = 5.0
+_disk_usage_cache = {"checked_at": float("-inf"), "free": 0}
+
+
+async def free_disk_space() -> int:
+    """
+    Возвращает свободное место в байтах (значение кэшируется на DISK_USAGE_TTL).
+
+    Проверяется файловая система AUDIO_DIR: при ее размещении на tmpfs
+    свободное место корневого раздела ничего не говорит о месте под аудио.
+    statfs на загруженном диске может занять десятки миллисекунд, поэтому
+    обновление кэша выполняется в пуле потоков, а не в event loop.
+    """
+    now = time.monotonic()
+    if now - _disk_usage_cache["checked_at"] > DISK_USAGE_TTL:
+        loop = asyncio.get_running_loop()
+        usage = await loop.run_in_executor(None, shutil.disk_usage, AUDIO_DIR)
+        _disk_usage_cache["free"] = usage.free
+        _disk_usage_cache["checked_at"] = now
+    return _disk_usage_cache["free"]
+
+# Предел предварительного резервирования места под документ: оценка по размеру
+# файла для pdf/docx сильно завышена и не должна вычищать все хранилище
+PREFETCH_SPACE_LIMIT_BYTES = 50 * 1024 * 1024
+
+
+# Быстрая речь дает примерно вдвое меньший файл на символ текста
+FAST_SPEECH_RATES = frozenset(("+25%", "+50%", "+75%", "+100%"))
+
+
+def estimate_audio_bytes(text_length: int, speech_rate: str = None) -> int:
+    """
+    Оценивает место под аудио с промежуточными файлами (медленная речь = больше файл).
+
+    Без speech_rate используется множитель самой медленной речи (оценка сверху).
+    """
+    multiplier = 300 if speech_rate in FAST_SPEECH_RATES else 600
+    return text_length * multiplier * 3  # ×3 для промежуточных файлов
+
+
+async def synthesize_and_send(
+    message: Message,
+    processing_msg: Message,
+    text: str,
+    user_id: int,
+    username: str,
+    *,
+    title: str,
+    request_type: str,
+    content: str,
+    single_title: str = None
+) -> bool:
+    """
+    Синтезирует текст с настройками пользователя, отправляет аудио и сохраняет запрос.
+
+    Части длинного текста отправляются по мере готовности через OrderedPartSender,
+    одиночный файл отправляется после синтеза. Готовое аудио остается в tts_cache:
+    повторный запрос с тем же текстом и настройками синтез не запускает.
+
+    Args:
+        message: Сообщение пользователя (куда отправлять аудио)
+        processing_msg: Сообщение со статусом обработки
+        text: Текст для синтеза
+        user_id: ID пользователя
+        username: Имя пользователя для истории запросов
+        title: Название аудио (для частей - "Часть N/M - title")
+        request_type: Тип запроса для истории ('text', 'document', 'url')
+        content: Содержимое запроса для истории
+        single_title: Название, если аудио получилось одним файлом (по умолчанию title)
+
+    Returns:
+        False если синтез не запускался из-за нехватки места на диске
+
+    Raises:
+        Exception: Если не удалось синтезировать аудио
+    """
+    # Получаем персональные настройки пользователя (одним запросом)
+    voice_name, speech_rate, max_duration = await get_user_settings(user_id)
+
+    # Проверяем свободное место на диске
+    free_space = await free_disk_space()
+    if free_space < MIN_FREE_DISK_BYTES:
+        await processing_msg.edit_text(
+            f"❌ Недостаточно места на сервере ({free_space/1024/1024:.0f} MB свободно).\n\n"
+            "Попробуйте позже или отправьте текст покороче."
+        )
+        return False
+
+    # Рассчитываем количество частей
+    parts_count, avg_duration = calculate_parts_info(text, max_duration)
+
+    if parts_count > 1:
+        duration_text = format_duration_display(avg_duration)
+        await processing_msg.edit_text(
+            f"🎤 Синтезирую речь...\n\n"
+            f"Текст будет разбит на {parts_count} частей (~{duration_text} каждая)"
+        )
+    else:
+        await processing_msg.edit_text("🎤 Синтезирую речь...")
+
+    await message.bot.send_chat_action(message.chat.id, ChatAction.RECORD_VOICE)
+
+    # Генерируем имя файла из первых 7 слов текста
+    audio_filename = generate_filename_from_text(text, user_id)
+    audio_path = str(AUDIO_DIR / audio_filename)
+
+    # Проверяем и освобождаем место
+    await storage_manager.ensure_space_available_async(estimate_audio_bytes(len(text), speech_rate))
+
+    # Если частей будет больше одной, используем упорядоченную отправку.
+    # Файлы принадлежат кэшу, поэтому после отправки не удаляются
+    sender = None
+    if parts_count > 1:
+        def title_formatter(part_num, total):
+            return f"Часть {part_num}/{total} - {title}"
+
+        sender = OrderedPartSender(message, parts_count, title_formatter, delete_after_send=False)
+
+    try:
+        # Части отправляются по исходным путям, поэтому в кэш они переносятся после отправки
+        audio_files = await tts_cache.get_or_synthesize(
+            text,
+            audio_path,
+            voice=voice_name,
+            rate=speech_rate,
+            pitch=TTS_PITCH,
+            max_duration_minutes=max_duration,
+            on_part_ready=sender.on_part_ready if sender else None,
+            before_store=sender.join if sender else None
+        )
+    finally:
+        if sender is not None:
+            await sender.join()
+
+    if not audio_files:
+        raise Exception("Не удалось синтезировать аудио")
+
+    # Если одна часть, отправляем её вручную (при множественных уже отправлено через callback).
+    # Файл остается в кэше и удаляется StorageManager при нехватке места,
+    # но не раньше, чем будет снято закрепление на время отправки
+    try:
+        if len(audio_files) == 1:
+            await processing_msg.edit_text("📤 Отправляю аудио...")
+            await message.answer_audio(
+                audio_input_file(audio_files[0], filename=audio_filename),
+                title=single_title or title,
+                performer="MKttsBOT"
+            )
+    finally:
+        tts_cache.release(audio_files)
+
+    # Удаляем сообщение о обработке
+    await processing_msg.delete()
+
+    # Сохраняем в БД (сохраняем путь к первому файлу)
+    await save_request(
+        user_id=user_id,
+        username=username,
+        request_type=request_type,
+        content=content,
+        audio_path=audio_files[0],
+        status='success'
+    )
+    return True
+
+
+async def report_request_error(
+    processing_msg: Message,
+    error_prefix: str,
+    error: Exception,
+    user_id: int,
+    username: str,
+    *,
+    request_type: str,
+    content: str
+):
+    """
+    Показывает ошибку в статусном сообщении и сохраняет неудачный запрос в историю.
+
+    Общий путь ошибки для обработчиков текста, URL и документов.
+    """
+    await processing_msg.edit_text(f"❌ {error_prefix}: {str(error)}")
+
+    await save_request(
+        user_id=user_id,
+        username=username,
+        request_type=request_type,
+        content=content,
+        status='error',
+        error_message=str(error)
+    )
 
 
 @router.message(Command("start"))
 async def cmd_start(message: Message):
     """Обработчик команды /start"""
-    await message.answer(WELCOME_MESSAGE)
+    user_id = message.from_user.id
+    voice_name, rate, _ = await get_user_settings(user_id)
+    voice = get_voice_display_name(voice_name)
+    await message.answer(welcome_for(voice, AVAILABLE_RATES.get(rate, rate)))
     # Показываем главное меню
     await show_main_menu(message)
 
@@ -169,49 +635,53 @@ async def cmd_menu(message: Message):
     await show_main_menu(message)
 
 
-async def show_main_menu(message: Message, edit: bool = False):
+@router.message(Command("cancel"), StateFilter("*"))
+async def cmd_cancel(message: Message, state: FSMContext):
+    """
+    Обработчик команды /cancel - прерывает диалог добавления канала/чата.
+
+    Зарегистрирован раньше обработчиков состояний, поэтому команда
+    не попадает в разбор username/ID.
+    """
+    if await state.get_state() is not None:
+        await state.clear()
+        await message.answer("❌ Действие отменено.")
+    await show_main_menu(message)
+
+
+MAIN_MENU_TEXT = "🎛 <b>Главное меню</b>\n\nВыберите действие:"
+
+
+async def show_main_menu(message: Message, edit: bool = False, user_id: int = None):
     """
     Показывает главное меню с inline кнопками.
 
     Args:
         message: Сообщение пользователя
         edit: Если True, редактирует существующее сообщение
+        user_id: ID пользователя; обязателен для сообщений бота (callback.message),
+                 у которых from_user - сам бот
     """
-    user_id = message.from_user.id
+    if user_id is None:
+        user_id = message.from_user.id
+    # Готовая клавиатура (владелец/пользователь), собирается один раз при импорте
     markup = get_main_menu_keyboard(user_id)
-    text = "🎛 <b>Главное меню</b>\n\nВыберите действие:"
 
     if edit:
-        try:
-            await message.edit_text(text, reply_markup=markup, parse_mode="HTML")
-        except TelegramBadRequest:
-            # Если не удалось отредактировать, отправляем новое
-            await message.answer(text, reply_markup=markup, parse_mode="HTML")
+        await edit_or_answer(message, MAIN_MENU_TEXT, reply_markup=markup, parse_mode="HTML")
     else:
-        await message.answer(text, reply_markup=markup, parse_mode="HTML")
+        await message.answer(MAIN_MENU_TEXT, reply_markup=markup, parse_mode="HTML")
 
 
 def get_voice_display_name(voice_name: str) -> str:
     """Формирует красивое отображение голоса для пользователя"""
-    # Получаем базовое имя голоса
-    if voice_name in AVAILABLE_VOICES:
-        display_name = AVAILABLE_VOICES[voice_name]["name"]
-    else:
-        display_name = voice_name  # fallback на ID голоса
-
-    return display_name
-
-
-@router.message(Command("help"))
-async def cmd_help(message: Message):
-    """Обработчик команды /help"""
-    user_id = message.from_user.id
+    # Для неизвестного голоса показываем его ID
+    return VOICE_DISPLAY_NAMES.get(voice_name, voice_name)
 
-    # Получаем текущий голос пользователя
-    voice_name = await get_user_voice(user_id)
-    voice_display = get_voice_display_name(voice_name)
 
-    help_text = f"""
+def _build_help_text(is_owner: bool) -> str:
+    """Собирает текст справки; голос пользователя подставляется через {voice}."""
+    help_text = """
 📖 <b>Помощь по использованию бота</b>
 
 <b>Основные команды:</b>
@@ -227,7 +697,7 @@ async def cmd_help(message: Message):
 /voice_new - Озвучить новые посты
 """
 
-    if is_owner(user_id):
+    if is_owner:
         help_text += """
 <b>Работа с чатами (только для владельца):</b>
 /add_chat @username N - Добавить чат
@@ -236,7 +706,7 @@ async def cmd_help(message: Message):
 
     help_text += f"""
 <b>Поддерживаемые форматы документов:</b>
-{', '.join(SUPPORTED_EXTENSIONS)}
+{SUPPORTED_EXTENSIONS_TEXT}
 
 <b>Способы озвучки:</b>
 1️⃣ <b>Текст</b> - просто отправьте текст
@@ -245,45 +715,71 @@ async def cmd_help(message: Message):
 4️⃣ <b>Пересланное сообщение</b> - перешлите пост
 
 <b>Настройки TTS:</b>
-🎤 Ваш голос: {voice_display}
+🎤 Ваш голос: {{voice}}
 ⚡ Скорость: {TTS_RATE}
 
 💾 Хранилище: {MAX_STORAGE_MB} MB
 """
-    await message.answer(help_text, parse_mode="HTML")
+    return help_text
 
 
-@router.message(Command("stats"))
-async def cmd_stats(message: Message):
-    """Обработчик команды /stats - показывает статистику хранилища"""
-    stats = storage_manager.get_storage_stats()
+# Справка зависит только от прав пользователя - собираем оба варианта один раз
+HELP_TEXT_OWNER = _build_help_text(is_owner=True)
+HELP_TEXT_USER = _build_help_text(is_owner=False)
+
 
-    stats_text = f"""
+@lru_cache(maxsize=16)
+def help_text_for(owner: bool, voice_name: str) -> str:
+    """Готовая справка для роли и голоса (кэшируется: вариантов всего несколько)."""
+    template = HELP_TEXT_OWNER if owner else HELP_TEXT_USER
+    return template.format(voice=get_voice_display_name(voice_name))
+
+
+async def get_help_text(user_id: int) -> str:
+    """Возвращает справку для пользователя с его текущим голосом."""
+    return help_text_for(is_owner(user_id), await get_user_voice(user_id))
+
+
+# Шаблон статистики хранилища: при запросе подставляются только цифры
+STATS_TEXT_TEMPLATE = """
 📊 <b>Статистика хранилища</b>
 
-💾 Использовано: {stats['total_size_mb']:.2f} MB / {stats['max_size_mb']:.0f} MB
-📈 Заполнено: {stats['used_percent']:.1f}%
-📁 Файлов: {stats['file_count']}
-✅ Свободно: {stats['available_mb']:.2f} MB
+💾 Использовано: {total_size_mb:.2f} MB / {max_size_mb:.0f} MB
+📈 Заполнено: {used_percent:.1f}%
+📁 Файлов: {file_count}
+✅ Свободно: {available_mb:.2f} MB
 """
+
+
+@router.message(Command("help"))
+async def cmd_help(message: Message):
+    """Обработчик команды /help"""
+    help_text = await get_help_text(message.from_user.id)
+    await message.answer(help_text, parse_mode="HTML")
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message):
+    """Обработчик команды /stats - показывает статистику хранилища"""
+    stats_text = STATS_TEXT_TEMPLATE.format_map(await storage_manager.get_storage_stats_async())
     await message.answer(stats_text, parse_mode="HTML")
 
 
 @router.message(F.document)
-async def handle_document(message: Message):
+async def handle_document(message: Message, uctx: tuple[int, str]):
     """Обработчик документов"""
     document = message.document
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
+    user_id, username = uctx
 
-    # Проверяем расширение файла
+    # Проверяем расширение файла (имя разбираем один раз: основа пойдет в название аудио)
     file_name = document.file_name
-    file_ext = os.path.splitext(file_name)[1].lower()
+    file_stem, file_ext = os.path.splitext(file_name)
+    file_ext = file_ext.lower()
 
-    if file_ext not in SUPPORTED_EXTENSIONS:
+    if file_ext not in SUPPORTED_EXTENSIONS_SET:
         await message.answer(
             f"❌ Формат файла '{file_ext}' не поддерживается.\n"
-            f"Поддерживаемые форматы: {', '.join(SUPPORTED_EXTENSIONS)}"
+            f"Поддерживаемые форматы: {SUPPORTED_EXTENSIONS_TEXT}"
         )
         return
 
@@ -294,145 +790,49 @@ async def handle_document(message: Message):
         # Показываем статус "печатает"
         await message.bot.send_chat_action(message.chat.id, ChatAction.TYPING)
 
-        # Скачиваем файл
-        file = await message.bot.get_file(document.file_id)
-        temp_file_path = AUDIO_DIR / f"temp_{user_id}_{document.file_id}{file_ext}"
-
-        await message.bot.download_file(file.file_path, temp_file_path)
+        # Скачиваем файл в память (Bot API отдает ботам файлы не больше 20 MB):
+        # без временного файла, его повторного чтения парсером и удаления.
+        # Место под аудио освобождаем параллельно со скачиванием: размер файла
+        # служит оценкой длины текста, точная проверка после парсинга обычно
+        # попадет в кэш размера хранилища и не будет повторно сканировать диск
+        buffer = io.BytesIO()
+        await asyncio.gather(
+            message.bot.download(document, destination=buffer),
+            storage_manager.ensure_space_available_async(min(
+                estimate_audio_bytes(document.file_size or 0),
+                PREFETCH_SPACE_LIMIT_BYTES
+            ))
+        )
 
         # Извлекаем текст
         await processing_msg.edit_text("📄 Извлекаю текст из документа...")
-        text = parse_document(str(temp_file_path))
-
-        # Удаляем временный файл
-        os.remove(temp_file_path)
-
-        # Получаем персональные настройки пользователя
-        voice_name = await get_user_voice(user_id)
-        speech_rate = await get_user_rate(user_id)
-        max_duration = await get_user_max_duration(user_id)
-
-        # Проверяем свободное место на диске
-        free_space = shutil.disk_usage("/").free
-        if free_space < 300_000_000:  # < 300MB
-            await processing_msg.edit_text(
-                f"❌ Недостаточно места на сервере ({free_space/1024/1024:.0f} MB свободно).\n\n"
-                "Попробуйте позже или отправьте текст покороче."
-            )
-            return
-
-        # Рассчитываем количество частей
-        parts_count, avg_duration = calculate_parts_info(text, max_duration)
-
-        if parts_count > 1:
-            duration_text = format_duration_display(avg_duration)
-            await processing_msg.edit_text(
-                f"🎤 Синтезирую речь...\n\n"
-                f"Текст будет разбит на {parts_count} частей (~{duration_text} каждая)"
-            )
-        else:
-            await processing_msg.edit_text("🎤 Синтезирую речь...")
-
-        await message.bot.send_chat_action(message.chat.id, ChatAction.RECORD_VOICE)
-
-        # Генерируем имя файла из первых 7 слов текста
-        audio_filename = generate_filename_from_text(text, user_id)
-        audio_path = AUDIO_DIR / audio_filename
-
-        # Проверяем и освобождаем место
-        # Коэффициент зависит от скорости речи (медленная речь = больше файл)
-        multiplier = 300 if speech_rate in ["+25%", "+50%", "+75%", "+100%"] else 600
-        estimated_size = len(text) * multiplier * 3  # ×3 для промежуточных файлов
-        await storage_manager.ensure_space_available_async(estimated_size)
-
-        # Берем имя из имени документа (без расширения)
-        doc_name = os.path.splitext(file_name)[0]
-
-        # Если частей будет больше одной, используем упорядоченную отправку
-        if parts_count > 1:
-            # Создаем sender для упорядоченной отправки
-            def title_formatter(part_num, total):
-                return f"Часть {part_num}/{total} - {doc_name}"
-
-            sender = OrderedPartSender(message, parts_count, title_formatter)
-
-            # Синтезируем с callback для отправки по мере готовности
-            audio_files = await synthesize_text_with_duration_limit(
-                text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH,
-                on_part_ready=sender.on_part_ready
-            )
-        else:
-            # Обычный синтез без callback
-            audio_files = await synthesize_text_with_duration_limit(
-                text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH
-            )
-
-        if not audio_files:
-            raise Exception("Не удалось синтезировать аудио")
-
-        # Если одна часть, отправляем её вручную (при множественных уже отправлено через callback)
-        if len(audio_files) == 1:
-            await processing_msg.edit_text("📤 Отправляю аудио...")
-            audio_file = FSInputFile(audio_files[0])
-            await message.answer_audio(
-                audio_file,
-                title=file_name,
-                performer="MKttsBOT"
-            )
-            # Удаляем файл сразу после отправки
-            try:
-                os.remove(audio_files[0])
-            except OSError:
-                pass
-
-        # Удаляем сообщение о обработке
-        await processing_msg.delete()
+        text = await parse_document_in_pool(buffer.getvalue(), file_name)
 
-        # Сохраняем в БД (сохраняем путь к первому файлу)
-        await save_request(
-            user_id=user_id,
-            username=username,
+        # Название частей берем из имени документа (без расширения)
+        await synthesize_and_send(
+            message,
+            processing_msg,
+            text,
+            user_id,
+            username,
+            title=file_stem,
+            single_title=file_name,
             request_type='document',
-            content=file_name,
-            audio_path=audio_files[0] if audio_files else None,
-            status='success'
+            content=file_name
         )
 
     except Exception as e:
-        error_msg = f"❌ Ошибка при обработке документа: {str(e)}"
-        await processing_msg.edit_text(error_msg)
-
-        # Сохраняем ошибку в БД
-        await save_request(
-            user_id=user_id,
-            username=username,
-            request_type='document',
-            content=file_name,
-            status='error',
-            error_message=str(e)
+        await report_request_error(
+            processing_msg, "Ошибка при обработке документа", e, user_id, username,
+            request_type='document', content=file_name
         )
 
-        # Удаляем временные файлы
-        if temp_file_path.exists():
-            os.remove(temp_file_path)
-
 
 @router.message(F.text & ~F.text.startswith('/'), StateFilter(None))
-async def handle_text(message: Message):
+async def handle_text(message: Message, uctx: tuple[int, str]):
     """Обработчик текстовых сообщений (текст или URL)"""
     text = message.text.strip()
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
+    user_id, username = uctx
 
     # Проверяем, является ли текст URL
     if is_valid_url(text):
@@ -454,117 +854,22 @@ async def handle_url(message: Message, url: str, user_id: int, username: str):
         from tts_common.web_parser import parse_url_async
         text = await parse_url_async(url)
 
-        # Получаем персональные настройки пользователя
-        voice_name = await get_user_voice(user_id)
-        speech_rate = await get_user_rate(user_id)
-        max_duration = await get_user_max_duration(user_id)
-
-        # Проверяем свободное место на диске
-        free_space = shutil.disk_usage("/").free
-        if free_space < 300_000_000:  # < 300MB
-            await processing_msg.edit_text(
-                f"❌ Недостаточно места на сервере ({free_space/1024/1024:.0f} MB свободно).\n\n"
-                "Попробуйте позже или отправьте текст покороче."
-            )
-            return
-
-        # Рассчитываем количество частей
-        parts_count, avg_duration = calculate_parts_info(text, max_duration)
-
-        if parts_count > 1:
-            duration_text = format_duration_display(avg_duration)
-            await processing_msg.edit_text(
-                f"🎤 Синтезирую речь...\n\n"
-                f"Текст будет разбит на {parts_count} частей (~{duration_text} каждая)"
-            )
-        else:
-            await processing_msg.edit_text("🎤 Синтезирую речь...")
-
-        await message.bot.send_chat_action(message.chat.id, ChatAction.RECORD_VOICE)
-
-        # Генерируем имя файла из первых 7 слов извлеченного текста
-        audio_filename = generate_filename_from_text(text, user_id)
-        audio_path = AUDIO_DIR / audio_filename
-
-        # Проверяем и освобождаем место
-        # Коэффициент зависит от скорости речи (медленная речь = больше файл)
-        multiplier = 300 if speech_rate in ["+25%", "+50%", "+75%", "+100%"] else 600
-        estimated_size = len(text) * multiplier * 3  # ×3 для промежуточных файлов
-        await storage_manager.ensure_space_available_async(estimated_size)
-
         # Берем первые 7 слов для названия
-        web_title = ' '.join(text.split()[:7])
-
-        # Если частей будет больше одной, используем упорядоченную отправку
-        if parts_count > 1:
-            # Создаем sender для упорядоченной отправки
-            def title_formatter(part_num, total):
-                return f"Часть {part_num}/{total} - {web_title}"
-
-            sender = OrderedPartSender(message, parts_count, title_formatter)
-
-            # Синтезируем с callback для отправки по мере готовности
-            audio_files = await synthesize_text_with_duration_limit(
-                text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH,
-                on_part_ready=sender.on_part_ready
-            )
-        else:
-            # Обычный синтез без callback
-            audio_files = await synthesize_text_with_duration_limit(
-                text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH
-            )
-
-        if not audio_files:
-            raise Exception("Не удалось синтезировать аудио")
-
-        # Если одна часть, отправляем её вручную (при множественных уже отправлено через callback)
-        if len(audio_files) == 1:
-            await processing_msg.edit_text("📤 Отправляю аудио...")
-            audio_file = FSInputFile(audio_files[0])
-            await message.answer_audio(
-                audio_file,
-                title=web_title,
-                performer="MKttsBOT"
-            )
-            # Удаляем файл сразу после отправки
-            try:
-                os.remove(audio_files[0])
-            except OSError:
-                pass
-
-        await processing_msg.delete()
-
-        # Сохраняем в БД (сохраняем путь к первому файлу)
-        await save_request(
-            user_id=user_id,
-            username=username,
+        await synthesize_and_send(
+            message,
+            processing_msg,
+            text,
+            user_id,
+            username,
+            title=' '.join(text.split()[:7]),
             request_type='url',
-            content=url,
-            audio_path=audio_files[0] if audio_files else None,
-            status='success'
+            content=url
         )
 
     except Exception as e:
-        error_msg = f"❌ Ошибка при обработке URL: {str(e)}"
-        await processing_msg.edit_text(error_msg)
-
-        await save_request(
-            user_id=user_id,
-            username=username,
-            request_type='url',
-            content=url,
-            status='error',
-            error_message=str(e)
+        await report_request_error(
+            processing_msg, "Ошибка при обработке URL", e, user_id, username,
+            request_type='url', content=url
         )
 
 
@@ -578,140 +883,81 @@ async def handle_plain_text(message: Message, text: str, user_id: int, username:
     processing_msg = await message.answer(PROCESSING_MESSAGE)
 
     try:
-        await message.bot.send_chat_action(message.chat.id, ChatAction.RECORD_VOICE)
-
-        # Получаем персональные настройки пользователя
-        voice_name = await get_user_voice(user_id)
-        speech_rate = await get_user_rate(user_id)
-        max_duration = await get_user_max_duration(user_id)
-
-        # Проверяем свободное место на диске
-        free_space = shutil.disk_usage("/").free
-        if free_space < 300_000_000:  # < 300MB
-            await processing_msg.edit_text(
-                f"❌ Недостаточно места на сервере ({free_space/1024/1024:.0f} MB свободно).\n\n"
-                "Попробуйте позже или отправьте текст покороче."
-            )
-            return
+        # Берем первые 7 слов для названия
+        await synthesize_and_send(
+            message,
+            processing_msg,
+            text,
+            user_id,
+            username,
+            title=' '.join(text.split()[:7]),
+            request_type='text',
+            content=text[:200]  # Сохраняем первые 200 символов
+        )
 
-        # Рассчитываем количество частей
-        parts_count, avg_duration = calculate_parts_info(text, max_duration)
+    except Exception as e:
+        await report_request_error(
+            processing_msg, "Ошибка при синтезе речи", e, user_id, username,
+            request_type='text', content=text[:200]
+        )
 
-        if parts_count > 1:
-            duration_text = format_duration_display(avg_duration)
-            await processing_msg.edit_text(
-                f"🎤 Синтезирую речь...\n\n"
-                f"Текст будет разбит на {parts_count} частей (~{duration_text} каждая)"
-            )
 
-        # Синтезируем аудио - используем первые 7 слов для имени файла
-        audio_filename = generate_filename_from_text(text, user_id)
-        audio_path = AUDIO_DIR / audio_filename
+# ===== НОВЫЕ ОБРАБОТЧИКИ ДЛЯ РАБОТЫ С КАНАЛАМИ И ЧАТАМИ =====
 
-        # Проверяем и освобождаем место
-        # Коэффициент зависит от скорости речи (медленная речь = больше файл)
-        multiplier = 300 if speech_rate in ["+25%", "+50%", "+75%", "+100%"] else 600
-        estimated_size = len(text) * multiplier * 3  # ×3 для промежуточных файлов
-        await storage_manager.ensure_space_available_async(estimated_size)
 
-        # Берем первые 7 слов для названия
-        text_title = ' '.join(text.split()[:7])
+def is_owner(user_id: int) -> bool:
+    """Проверяет, является ли пользователь владельцем бота."""
+    return user_id == OWNER_ID
 
-        # Если частей будет больше одной, используем упорядоченную отправку
-        if parts_count > 1:
-            # Создаем sender для упорядоченной отправки
-            def title_formatter(part_num, total):
-                return f"Часть {part_num}/{total} - {text_title}"
-
-            sender = OrderedPartSender(message, parts_count, title_formatter)
-
-            # Синтезируем с callback для отправки по мере готовности
-            audio_files = await synthesize_text_with_duration_limit(
-                text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH,
-                on_part_ready=sender.on_part_ready
-            )
-        else:
-            # Обычный синтез без callback
-            audio_files = await synthesize_text_with_duration_limit(
-                text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH
-            )
 
-        if not audio_files:
-            raise Exception("Не удалось синтезировать аудио")
+# Больше 100 сообщений за раз Telethon-сервис все равно не читает
+MAX_MESSAGES_COUNT = 100
 
-        # Если одна часть, отправляем её вручную (при множественных уже отправлено через callback)
-        if len(audio_files) == 1:
-            await processing_msg.edit_text("📤 Отправляю аудио...")
-            audio_file = FSInputFile(audio_files[0])
-            await message.answer_audio(
-                audio_file,
-                title=text_title,
-                performer="MKttsBOT"
-            )
-            # Удаляем файл сразу после отправки
-            try:
-                os.remove(audio_files[0])
-            except OSError:
-                pass
 
-        # Удаляем сообщение о обработке
-        await processing_msg.delete()
+def parse_messages_count(value: str) -> int:
+    """
+    Разбирает количество сообщений из команды или callback_data без исключений.
 
-        # Сохраняем в БД (сохраняем путь к первому файлу)
-        await save_request(
-            user_id=user_id,
-            username=username,
-            request_type='text',
-            content=text[:200],  # Сохраняем первые 200 символов
-            audio_path=audio_files[0] if audio_files else None,
-            status='success'
-        )
+    Длина проверяется до int(), чтобы огромные строки цифр не разбирались.
 
-    except Exception as e:
-        error_msg = f"❌ Ошибка при синтезе речи: {str(e)}"
-        await processing_msg.edit_text(error_msg)
+    Returns:
+        Количество (не больше MAX_MESSAGES_COUNT) или 0 для некорректного значения
+    """
+    if not value.isdecimal() or len(value) > 4:
+        return 0
+    return min(int(value), MAX_MESSAGES_COUNT)
 
-        await save_request(
-            user_id=user_id,
-            username=username,
-            request_type='text',
-            content=text[:200],
-            status='error',
-            error_message=str(e)
-        )
 
+# Аргументы /add_channel и /add_chat: "<источник> <количество>", остальное игнорируется
+ADD_SOURCE_ARGS_RE = re.compile(r'\s*(\S+)\s+(\S+)')
 
-# ===== НОВЫЕ ОБРАБОТЧИКИ ДЛЯ РАБОТЫ С КАНАЛАМИ И ЧАТАМИ =====
 
+def parse_add_source_args(args: str):
+    """
+    Разбирает аргументы команды добавления источника одним проходом регулярного выражения.
 
-def is_owner(user_id: int) -> bool:
-    """Проверяет, является ли пользователь владельцем бота."""
-    return user_id == OWNER_ID
+    Returns:
+        Кортеж (идентификатор, количество) или None при неверном формате;
+        количество равно 0, если оно некорректно (см. parse_messages_count)
+    """
+    match = ADD_SOURCE_ARGS_RE.match(args) if args else None
+    if match is None:
+        return None
+    return match.group(1), parse_messages_count(match.group(2))
 
 
 @router.message(Command("add_channel"))
-async def cmd_add_channel(message: Message):
+async def cmd_add_channel(message: Message, command: CommandObject):
     """
     Обработчик команды /add_channel.
     Формат: /add_channel @username 10
     """
     user_id = message.from_user.id
 
-    # Парсим команду
-    text = message.text.strip()
-    parts = text.split()
+    # Парсим аргументы команды (сама команда уже разобрана фильтром Command)
+    parsed = parse_add_source_args(command.args)
 
-    if len(parts) < 3:
+    if parsed is None:
         await message.answer(
             "❌ Неверный формат команды!\n\n"
             "Используйте: /add_channel @username количество\n"
@@ -719,12 +965,10 @@ async def cmd_add_channel(message: Message):
         )
         return
 
-    channel_username = parts[1]
-    try:
-        initial_count = int(parts[2])
-        if initial_count <= 0:
-            raise ValueError
-    except ValueError:
+    # '@' снимаем один раз: в БД username хранится без него, Telethon принимает оба варианта
+    channel_username, initial_count = parsed
+    channel_username = channel_username.lstrip('@')
+    if initial_count <= 0:
         await message.answer("❌ Количество сообщений должно быть положительным числом!")
         return
 
@@ -738,7 +982,7 @@ async def cmd_add_channel(message: Message):
         channel_info = await telethon.get_channel_info(channel_username)
 
         if not channel_info:
-            await processing_msg.edit_text(f"❌ Канал {channel_username} не найден!")
+            await processing_msg.edit_text(f"❌ Канал @{channel_username} не найден!")
             return
 
         channel_id, channel_title = channel_info
@@ -746,7 +990,7 @@ async def cmd_add_channel(message: Message):
         # Сохраняем в БД
         await add_tracked_channel(
             user_id=user_id,
-            channel_username=channel_username.lstrip('@'),
+            channel_username=channel_username,
             channel_id=channel_id,
             channel_title=channel_title
         )
@@ -774,12 +1018,12 @@ async def cmd_add_channel(message: Message):
         )
 
     except Exception as e:
-        logger.error(f"Ошибка при добавлении канала: {e}")
+        logger.error("Ошибка при добавлении канала: %s", e)
         await processing_msg.edit_text(f"❌ Ошибка при добавлении канала: {str(e)}")
 
 
 @router.message(Command("add_chat"))
-async def cmd_add_chat(message: Message):
+async def cmd_add_chat(message: Message, command: CommandObject):
     """
     Обработчик команды /add_chat (только для владельца).
     Формат: /add_chat @username 10 или /add_chat 123456789 10
@@ -791,11 +1035,10 @@ async def cmd_add_chat(message: Message):
         await message.answer("❌ Эта команда доступна только владельцу бота!")
         return
 
-    # Парсим команду
-    text = message.text.strip()
-    parts = text.split()
+    # Парсим аргументы команды (сама команда уже разобрана фильтром Command)
+    parsed = parse_add_source_args(command.args)
 
-    if len(parts) < 3:
+    if parsed is None:
         await message.answer(
             "❌ Неверный формат команды!\n\n"
             "Используйте: /add_chat @username количество\n"
@@ -804,12 +1047,8 @@ async def cmd_add_chat(message: Message):
         )
         return
 
-    chat_identifier = parts[1]
-    try:
-        initial_count = int(parts[2])
-        if initial_count <= 0:
-            raise ValueError
-    except ValueError:
+    chat_identifier, initial_count = parsed
+    if initial_count <= 0:
         await message.answer("❌ Количество сообщений должно быть положительным числом!")
         return
 
@@ -848,19 +1087,187 @@ async def cmd_add_chat(message: Message):
             )
             return
 
-        await voice_messages(
-            message,
-            messages,
-            user_id,
-            source_type='chat',
-            source_id=chat_id,
-            status_msg=processing_msg,
-            source_title=chat_title
-        )
+        await voice_messages(
+            message,
+            messages,
+            user_id,
+            source_type='chat',
+            source_id=chat_id,
+            status_msg=processing_msg,
+            source_title=chat_title
+        )
+
+    except Exception as e:
+        logger.error("Ошибка при добавлении чата: %s", e)
+        await processing_msg.edit_text(f"❌ Ошибка при добавлении чата: {str(e)}")
+
+
+# Сколько источников /voice_new одновременно запрашиваются у Telegram (ограничение против FloodWait)
+VOICE_NEW_FETCH_CONCURRENCY = 5
+# Сколько источников /voice_new одновременно синтезируются и отправляются
+VOICE_NEW_CONCURRENCY = 4
+# Сколько загруженных, но еще не озвученных источников может ждать в очереди
+VOICE_NEW_QUEUE_SIZE = 4
+
+# Сколько секунд считать источник пустым после чтения без новых сообщений:
+# повторные /voice_new в этом окне не тратят запросы к Telegram
+EMPTY_SOURCE_TTL = 60.0
+
+# {(тип источника, ID источника, min_id): время истечения}
+_empty_sources: dict = {}
+
+
+def _is_known_empty(key: tuple) -> bool:
+    """Проверяет, что источник недавно читался с тем же min_id и новых сообщений не было."""
+    expires = _empty_sources.get(key)
+    if expires is None:
+        return False
+    if time.monotonic() > expires:
+        del _empty_sources[key]
+        return False
+    return True
+
+
+def _remember_empty(key: tuple):
+    """Запоминает пустой источник; устаревшие записи вычищаются при росте словаря."""
+    now = time.monotonic()
+    if len(_empty_sources) >= 1024:
+        for stale_key in [k for k, expires in _empty_sources.items() if expires < now]:
+            del _empty_sources[stale_key]
+    _empty_sources[key] = now + EMPTY_SOURCE_TTL
+
+
+async def voice_new_sources(
+    message: Message,
+    status_msg: Message,
+    user_id: int,
+    channels: list,
+    chats: list | tuple
+) -> int:
+    """
+    Озвучивает новые сообщения всех источников.
+
+    Загрузка и озвучка связаны ограниченной очередью: производители
+    (по одному на источник) читают сообщения из Telegram, пока обработчики
+    озвучивают уже загруженные источники. Размер очереди ограничивает число
+    загруженных, но еще не озвученных источников в памяти.
+    Ошибка одного источника не прерывает остальные. Последние озвученные ID
+    всех источников сохраняются в БД одной транзакцией в конце.
+
+    Returns:
+        Общее количество новых сообщений
+    """
+    # Сервис Telethon - общий для всего процесса клиент, поднятый при старте бота;
+    # запрашиваем его один раз и только когда есть что озвучивать
+    telethon = await get_telethon_service()
+
+    # Источники приводятся к общему виду один раз, методы чтения Telethon
+    # привязываются заранее: (тип, ID, название, подпись, метод чтения, аргумент метода)
+    get_channel_messages = telethon.get_channel_messages
+    get_chat_messages = telethon.get_chat_messages
+    sources = [
+        ('channel', channel.channel_id, channel.channel_title, f"📢 {channel.channel_title}",
+         get_channel_messages, channel.channel_username)
+        for channel in channels
+    ] + [
+        ('chat', chat.chat_id, chat.chat_title, f"💬 {chat.chat_title}",
+         get_chat_messages, chat.chat_id)
+        for chat in chats
+    ]
+
+    # Последние озвученные ID всех источников - одним запросом к БД
+    last_ids = await get_last_voiced_message_ids(
+        user_id, [(source_type, source_id) for source_type, source_id, *_ in sources]
+    )
+    # ID последних сообщений источников - одним запросом к Telegram: источники
+    # без новых сообщений пропускаются без чтения истории
+    top_ids = await telethon.get_top_message_ids([ref for *_, ref in sources])
+
+    fetch_semaphore = asyncio.Semaphore(VOICE_NEW_FETCH_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=VOICE_NEW_QUEUE_SIZE)
+    # Источники завершаются пачками - промежуточный прогресс схлопывается
+    progress = DebouncedEditor(status_msg)
+    voiced_rows = []
+    total_new_messages = 0
+    done_count = 0
+
+    async def produce(source_type: str, source_id: int, title: str, label: str, fetch, ref):
+        last_msg_id = last_ids.get((source_type, source_id), 0)
+        empty_key = (source_type, source_id, last_msg_id)
+        top_id = top_ids.get(ref)
+        # Точный ID последнего сообщения из GetPeerDialogs важнее памяти о пустых
+        # источниках: она нужна только источникам, которых нет среди диалогов
+        if top_id is not None:
+            skip = top_id <= last_msg_id
+        else:
+            skip = _is_known_empty(empty_key)
+        if skip:
+            await queue.put(None)
+            return
+
+        try:
+            async with fetch_semaphore:
+                messages = await fetch(
+                    ref,
+                    limit=100,  # Максимум 100 новых сообщений за раз
+                    min_id=last_msg_id,
+                    raise_errors=True  # Сбой чтения не должен запомниться как пустой источник
+                )
+            if not messages:
+                _remember_empty(empty_key)
+            item = (source_type, source_id, title, label, messages)
+        except Exception as e:
+            logger.error("Ошибка при получении сообщений источника %s: %s", source_id, e)
+            item = None
+        # None - источник обработан без сообщений для озвучки
+        await queue.put(item)
+
+    async def consume():
+        nonlocal total_new_messages, done_count
+        while True:
+            item = await queue.get()
+            try:
+                done_count += 1
+                if item is None or not item[4]:
+                    continue
+
+                source_type, source_id, title, label, messages = item
+                await voice_messages(
+                    message,
+                    messages,
+                    user_id,
+                    source_type=source_type,
+                    source_id=source_id,
+                    status_msg=None,  # Не обновляем статус для каждого источника
+                    source_title=title,
+                    voiced_rows=voiced_rows
+                )
+                total_new_messages += len(messages)
+
+                await progress.edit_text(
+                    f"{label}: озвучено {len(messages)} новых сообщений\n"
+                    f"⏳ Обработано источников: {done_count}/{len(sources)}"
+                )
+            except Exception as e:
+                logger.error("Ошибка при обработке источника: %s", e)
+            finally:
+                queue.task_done()
 
-    except Exception as e:
-        logger.error(f"Ошибка при добавлении чата: {e}")
-        await processing_msg.edit_text(f"❌ Ошибка при добавлении чата: {str(e)}")
+    consumers = [asyncio.create_task(consume()) for _ in range(VOICE_NEW_CONCURRENCY)]
+    try:
+        await asyncio.gather(*(produce(*source) for source in sources))
+        await queue.join()
+    finally:
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+        # Итоговый статус выставляет вызывающий код
+        progress.cancel()
+        # Отметки уже отправленных озвучек сохраняются и при прерывании обхода,
+        # иначе следующий /voice_new повторит их
+        await save_voiced_messages_bulk(voiced_rows)
+
+    return total_new_messages
 
 
 @router.message(Command("voice_new"))
@@ -871,16 +1278,11 @@ async def cmd_voice_new(message: Message):
     processing_msg = await message.answer("⏳ Проверяю новые сообщения...")
 
     try:
-        # Получаем сервис Telethon
-        telethon = await get_telethon_service()
-
         # Получаем все отслеживаемые каналы
         channels = await get_tracked_channels(user_id)
 
         # Получаем все отслеживаемые чаты (только для владельца)
-        chats = []
-        if is_owner(user_id):
-            chats = await get_tracked_chats(user_id)
+        chats = await get_tracked_chats(user_id) if is_owner(user_id) else ()
 
         if not channels and not chats:
             await processing_msg.edit_text(
@@ -889,82 +1291,79 @@ async def cmd_voice_new(message: Message):
             )
             return
 
-        total_new_messages = 0
+        total_new_messages = await voice_new_sources(message, processing_msg, user_id, channels, chats)
 
-        # Обрабатываем каналы
-        for channel in channels:
-            last_msg_id = await get_last_voiced_message_id(user_id, 'channel', channel.channel_id)
+        if total_new_messages == 0:
+            await processing_msg.edit_text("✅ Нет новых сообщений для озвучки!")
+        else:
+            await processing_msg.edit_text(f"✅ Озвучено {total_new_messages} новых сообщений!")
 
-            messages = await telethon.get_channel_messages(
-                channel.channel_username,
-                limit=100,  # Максимум 100 новых сообщений за раз
-                min_id=last_msg_id
-            )
+    except Exception as e:
+        logger.error("Ошибка при озвучке новых сообщений: %s", e)
+        await processing_msg.edit_text(f"❌ Ошибка: {str(e)}")
 
-            if messages:
-                await processing_msg.edit_text(
-                    f"📢 Канал: {channel.channel_title}\n"
-                    f"⏳ Озвучиваю {len(messages)} новых сообщений..."
-                )
 
-                await voice_messages(
-                    message,
-                    messages,
-                    user_id,
-                    source_type='channel',
-                    source_id=channel.channel_id,
-                    status_msg=None,  # Не обновляем статус для каждого канала
-                    source_title=channel.channel_title
-                )
+# Сколько символов озвученного текста сохраняется в voiced_messages
+VOICED_PREVIEW_LENGTH = 200
 
-                total_new_messages += len(messages)
 
-        # Обрабатываем чаты (только для владельца)
-        for chat in chats:
-            last_msg_id = await get_last_voiced_message_id(user_id, 'chat', chat.chat_id)
+def join_messages_preview(texts: list, limit: int = VOICED_PREVIEW_LENGTH) -> str:
+    """Склеивает тексты через пустую строку, останавливаясь как только набрано limit символов."""
+    parts = []
+    total = 0
+    for text in texts:
+        if total + len(text) >= limit:
+            parts.append(text[:limit - total])
+            break
+        parts.append(text)
+        total += len(text) + 2
 
-            messages = await telethon.get_chat_messages(
-                chat.chat_id,
-                limit=100,
-                min_id=last_msg_id
-            )
+    return "\n\n".join(parts)[:limit]
 
-            if messages:
-                await processing_msg.edit_text(
-                    f"💬 Чат: {chat.chat_title}\n"
-                    f"⏳ Озвучиваю {len(messages)} новых сообщений..."
-                )
 
-                await voice_messages(
-                    message,
-                    messages,
-                    user_id,
-                    source_type='chat',
-                    source_id=chat.chat_id,
-                    status_msg=None,
-                    source_title=chat.chat_title
-                )
+# Ограничение одновременных синтезов при озвучке сообщений каналов и чатов
+# (всех пользователей и источников вместе): отправка аудио выполняется вне его,
+# поэтому загрузка в Telegram идет параллельно со следующим синтезом
+VOICE_SYNTH_SEMAPHORE = asyncio.Semaphore(TTS_CONCURRENCY)
 
-                total_new_messages += len(messages)
 
-        if total_new_messages == 0:
-            await processing_msg.edit_text("✅ Нет новых сообщений для озвучки!")
-        else:
-            await processing_msg.edit_text(f"✅ Озвучено {total_new_messages} новых сообщений!")
+async def voice_messages(
+    message: Message,
+    messages: list,
+    user_id: int,
+    source_type: str,
+    source_id: int,
+    status_msg: Message = None,
+    source_title: str = None,
+    voiced_rows: list = None
+):
+    """
+    Озвучивает список сообщений как единый текст.
 
-    except Exception as e:
-        logger.error(f"Ошибка при озвучке новых сообщений: {e}")
-        await processing_msg.edit_text(f"❌ Ошибка: {str(e)}")
+    Этапы идут друг за другом быстрее лимита Telegram на правки, поэтому
+    статус обновляется через DebouncedEditor; последний текст применяется в конце.
+    Аргументы - как у _voice_messages.
+    """
+    editor = DebouncedEditor(status_msg) if status_msg is not None else None
+    try:
+        await _voice_messages(
+            message, messages, user_id, source_type, source_id,
+            status_msg=editor, source_title=source_title, voiced_rows=voiced_rows
+        )
+    finally:
+        if editor is not None:
+            await editor.flush()
 
 
-async def voice_messages(
+async def _voice_messages(
     message: Message,
     messages: list,
     user_id: int,
     source_type: str,
     source_id: int,
-    status_msg: Message = None,
-    source_title: str = None
+    status_msg: DebouncedEditor = None,
+    source_title: str = None,
+    voiced_rows: list = None
 ):
     """
     Озвучивает список сообщений как единый текст.
@@ -977,15 +1376,14 @@ async def voice_messages(
         source_id: ID источника
         status_msg: Сообщение для обновления статуса
         source_title: Название канала или чата (опционально)
+        voiced_rows: Если передан, запись о последнем озвученном сообщении
+                     добавляется в список вместо немедленного сохранения в БД
     """
     if not messages:
         return
 
-    # Фильтруем пустые сообщения и собираем валидные
-    valid_messages = []
-    for msg_id, text in messages:
-        if text and len(text) >= 10:
-            valid_messages.append((msg_id, text))
+    # Фильтруем пустые и слишком короткие сообщения
+    valid_messages = [(msg_id, text) for msg_id, text in messages if text and len(text) >= 10]
 
     if not valid_messages:
         if status_msg:
@@ -997,16 +1395,14 @@ async def voice_messages(
             await status_msg.edit_text(f"🎤 Объединяю {len(valid_messages)} сообщений...")
 
         # Объединяем все сообщения в один текст с разделителем
-        combined_text = "\n\n".join([text for _, text in valid_messages])
+        combined_text = "\n\n".join(text for _, text in valid_messages)
 
-        # Получаем персональные настройки пользователя
-        voice_name = await get_user_voice(user_id)
-        speech_rate = await get_user_rate(user_id)
-        max_duration = await get_user_max_duration(user_id)
+        # Получаем персональные настройки пользователя (одним запросом)
+        voice_name, speech_rate, max_duration = await get_user_settings(user_id)
 
         # Проверяем свободное место на диске
-        free_space = shutil.disk_usage("/").free
-        if free_space < 300_000_000:  # < 300MB
+        free_space = await free_disk_space()
+        if free_space < MIN_FREE_DISK_BYTES:
             if status_msg:
                 await status_msg.edit_text(
                     f"❌ Недостаточно места на сервере ({free_space/1024/1024:.0f} MB свободно).\n\n"
@@ -1030,23 +1426,28 @@ async def voice_messages(
 
         # Генерируем имя файла из первого сообщения
         audio_filename = generate_filename_from_text(valid_messages[0][1], user_id)
-        audio_path = AUDIO_DIR / audio_filename
+        audio_path = str(AUDIO_DIR / audio_filename)
 
-        # Проверяем и освобождаем место
-        # Коэффициент зависит от скорости речи (медленная речь = больше файл)
-        multiplier = 300 if speech_rate in ["+25%", "+50%", "+75%", "+100%"] else 600
-        estimated_size = len(combined_text) * multiplier * 3  # ×3 для промежуточных файлов
-        await storage_manager.ensure_space_available_async(estimated_size)
+        # Проверяем и освобождаем место (медленная речь = больше файл)
+        await storage_manager.ensure_space_available_async(
+            estimate_audio_bytes(len(combined_text), speech_rate)
+        )
 
         # Формируем базовое название аудио
         if source_title:
             # Очищаем название от недопустимых символов
-            clean_title = sanitize_filename(source_title).replace('.mp3', '')
-            base_title = f"{clean_title} ({len(valid_messages)} messages)"
+            title_prefix = sanitize_filename(source_title).removesuffix('.mp3')
         else:
             # Fallback на старое поведение
-            source_name = "Channel" if source_type == "channel" else "Chat"
-            base_title = f"{source_name} ({len(valid_messages)} messages)"
+            title_prefix = "Channel" if source_type == "channel" else "Chat"
+        base_title = f"{title_prefix} ({len(valid_messages)} messages)"
+
+        # Индексы реально озвученных сообщений (при разбиении на части - все или ничего)
+        voiced_indices = list(range(len(valid_messages)))
+        # Короткий текст синтезируется в память и загружается без файла на диске
+        audio_bytes = None
+        # Файлы из tts_cache после отправки не удаляются
+        from_cache = False
 
         # Если частей будет больше одной, используем упорядоченную отправку
         if parts_count > 1:
@@ -1054,28 +1455,66 @@ async def voice_messages(
             def title_formatter(part_num, total):
                 return f"Часть {part_num}/{total} - {base_title}"
 
-            sender = OrderedPartSender(message, parts_count, title_formatter)
-
-            # Синтезируем с callback для отправки по мере готовности
-            audio_files = await synthesize_text_with_duration_limit(
-                combined_text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH,
-                on_part_ready=sender.on_part_ready
-            )
+            sender = OrderedPartSender(message, parts_count, title_formatter, delete_after_send=False)
+
+            # Синтезируем с callback для отправки по мере готовности; повторный
+            # текст (например, тот же пост в нескольких каналах) берется из кэша
+            # Семафор занят только на время синтеза: ожидание отправки частей
+            # (before_store) и перенос в кэш идут уже после его освобождения
+            try:
+                audio_files = await tts_cache.get_or_synthesize(
+                    combined_text,
+                    audio_path,
+                    voice=voice_name,
+                    rate=speech_rate,
+                    pitch=TTS_PITCH,
+                    max_duration_minutes=max_duration,
+                    on_part_ready=sender.on_part_ready,
+                    before_store=sender.join,
+                    synthesis_slot=VOICE_SYNTH_SEMAPHORE
+                )
+            finally:
+                await sender.join()
+            from_cache = True
         else:
-            # Обычный синтез без callback
-            audio_files = await synthesize_text_with_duration_limit(
-                combined_text,
-                str(audio_path),
-                max_duration_minutes=max_duration,
-                voice=voice_name,
-                rate=speech_rate,
-                pitch=TTS_PITCH
-            )
+            cache_key = tts_cache_key(combined_text, voice_name, speech_rate, TTS_PITCH, max_duration)
+            audio_files = await tts_cache.lookup(cache_key)
+            from_cache = audio_files is not None
+            if audio_files is None and len(combined_text) <= CHUNK_CHAR_LIMIT:
+                # Текст укладывается в один запрос к TTS: файл не нужен для сшивки,
+                # аудио отправляется из памяти и только после отправки пишется в кэш
+                async with VOICE_SYNTH_SEMAPHORE:
+                    audio_bytes = await synthesize_text_to_bytes(
+                        combined_text,
+                        voice=voice_name,
+                        rate=speech_rate,
+                        pitch=TTS_PITCH
+                    )
+                audio_files = [None] if audio_bytes else []
+
+        if audio_files is None:
+            # Один итоговый файл: сообщения синтезируются параллельно по отдельности
+            # и сшиваются ffmpeg, ошибка одного сообщения не теряет остальные
+            async with VOICE_SYNTH_SEMAPHORE:
+                voiced_indices = await synthesize_texts_merged(
+                    [text for _, text in valid_messages],
+                    audio_path,
+                    voice=voice_name,
+                    rate=speech_rate,
+                    pitch=TTS_PITCH
+                )
+            if voiced_indices and len(voiced_indices) < len(valid_messages):
+                logger.warning(
+                    "Озвучено %s из %s сообщений источника %s",
+                    len(voiced_indices), len(valid_messages), source_id
+                )
+            audio_files = [audio_path] if voiced_indices else []
+
+            # В кэш попадает только аудио всех сообщений: частичный результат
+            # зависит от случайных сбоев синтеза и не должен переиспользоваться
+            if len(voiced_indices) == len(valid_messages):
+                audio_files = await tts_cache.store(cache_key, audio_files)
+                from_cache = True
 
         if not audio_files:
             if status_msg:
@@ -1083,38 +1522,63 @@ async def voice_messages(
             return
 
         # Если одна часть, отправляем её вручную (при множественных уже отправлено через callback)
-        if len(audio_files) == 1:
-            if status_msg:
-                await status_msg.edit_text("📤 Отправляю аудио...")
-
-            audio_file = FSInputFile(audio_files[0])
-            await message.answer_audio(
-                audio_file,
-                title=base_title,
-                performer="MKttsBOT"
-            )
-            # Удаляем файл сразу после отправки
-            try:
-                os.remove(audio_files[0])
-            except OSError:
-                pass
-
-        # Сохраняем в БД информацию о последнем озвученном сообщении
-        last_msg_id = valid_messages[-1][0]
-        await save_voiced_message(
-            user_id=user_id,
-            source_type=source_type,
-            source_id=source_id,
-            message_id=last_msg_id,
-            message_text=combined_text[:200],
-            audio_path=audio_files[0] if audio_files else None
+        # Файлы из кэша закреплены на время отправки
+        try:
+            if len(audio_files) == 1:
+                if status_msg:
+                    await status_msg.edit_text("📤 Отправляю аудио...")
+
+                if audio_bytes is not None:
+                    audio_file = BufferedInputFile(audio_bytes, filename=audio_filename)
+                else:
+                    audio_file = audio_input_file(audio_files[0])
+                await message.answer_audio(
+                    audio_file,
+                    # Часть сообщений могла не озвучиться - в названии только вошедшие
+                    title=f"{title_prefix} ({len(voiced_indices)} messages)",
+                    performer="MKttsBOT"
+                )
+                if audio_bytes is not None:
+                    # Тот же пост в другом источнике возьмется из кэша без синтеза;
+                    # аудио уже отправлено, поэтому ошибка записи не прерывает озвучку
+                    try:
+                        await tts_cache.store_bytes(cache_key, audio_bytes)
+                    except OSError as e:
+                        logger.warning("Не удалось сохранить аудио в кэш: %s", e)
+                elif not from_cache:
+                    # Удаляем файл сразу после отправки (кроме файлов кэша)
+                    await remove_file_quietly(audio_files[0])
+        finally:
+            if from_cache:
+                tts_cache.release(audio_files)
+
+        # Сохраняем в БД информацию о последнем озвученном сообщении.
+        # Следующее чтение источника начнется после него (min_id), поэтому берем
+        # конец непрерывного озвученного начала: сообщение, не вошедшее в аудио,
+        # и все после него будут озвучены повторно, а не пропущены навсегда
+        voiced_set = set(voiced_indices)
+        voiced_prefix = next(
+            (i for i in range(len(valid_messages)) if i not in voiced_set), len(valid_messages)
         )
+        if voiced_prefix:
+            voiced_row = {
+                "user_id": user_id,
+                "source_type": source_type,
+                "source_id": source_id,
+                "message_id": valid_messages[voiced_prefix - 1][0],
+                "message_text": join_messages_preview([valid_messages[i][1] for i in voiced_indices]),
+                "audio_path": audio_files[0] if audio_files else None
+            }
+            if voiced_rows is not None:
+                voiced_rows.append(voiced_row)
+            else:
+                await save_voiced_message(**voiced_row)
 
         if status_msg:
-            await status_msg.edit_text(f"✅ Озвучено {len(valid_messages)} сообщений!")
+            await status_msg.edit_text(f"✅ Озвучено {len(voiced_indices)} сообщений!")
 
     except Exception as e:
-        logger.error(f"Ошибка при озвучке сообщений: {e}")
+        logger.error("Ошибка при озвучке сообщений: %s", e)
         if status_msg:
             await status_msg.edit_text(f"❌ Ошибка: {str(e)}")
 
@@ -1124,15 +1588,16 @@ async def cmd_my_channels(message: Message):
     """Показывает список отслеживаемых каналов."""
     user_id = message.from_user.id
 
-    channels = await get_tracked_channels(user_id)
+    lines = [
+        f"• @{channel.channel_username} - {channel.channel_title}\n"
+        async for channel in iter_tracked_channels(user_id)
+    ]
 
-    if not channels:
+    if not lines:
         await message.answer("У вас нет отслеживаемых каналов.")
         return
 
-    text = "📢 <b>Ваши отслеживаемые каналы:</b>\n\n"
-    for channel in channels:
-        text += f"• @{channel.channel_username} - {channel.channel_title}\n"
+    text = "📢 <b>Ваши отслеживаемые каналы:</b>\n\n" + "".join(lines)
 
     await message.answer(text, parse_mode="HTML")
 
@@ -1146,16 +1611,16 @@ async def cmd_my_chats(message: Message):
         await message.answer("❌ Эта команда доступна только владельцу бота!")
         return
 
-    chats = await get_tracked_chats(user_id)
+    lines = []
+    async for chat in iter_tracked_chats(user_id):
+        username_text = f"@{chat.chat_username}" if chat.chat_username else f"ID: {chat.chat_id}"
+        lines.append(f"• {username_text} - {chat.chat_title}\n")
 
-    if not chats:
+    if not lines:
         await message.answer("У вас нет отслеживаемых чатов.")
         return
 
-    text = "💬 <b>Ваши отслеживаемые чаты:</b>\n\n"
-    for chat in chats:
-        username_text = f"@{chat.chat_username}" if chat.chat_username else f"ID: {chat.chat_id}"
-        text += f"• {username_text} - {chat.chat_title}\n"
+    text = "💬 <b>Ваши отслеживаемые чаты:</b>\n\n" + "".join(lines)
 
     await message.answer(text, parse_mode="HTML")
 
@@ -1164,10 +1629,9 @@ async def cmd_my_chats(message: Message):
 
 
 @router.message(F.forward_from | F.forward_from_chat)
-async def handle_forwarded(message: Message):
+async def handle_forwarded(message: Message, uctx: tuple[int, str]):
     """Обработчик пересланных сообщений."""
-    user_id = message.from_user.id
-    username = message.from_user.username or message.from_user.first_name
+    user_id, username = uctx
 
     # Извлекаем текст из пересланного сообщения
     text = None
@@ -1188,6 +1652,36 @@ async def handle_forwarded(message: Message):
 
 # ===== CALLBACK HANDLERS ДЛЯ INLINE КНОПОК =====
 
+# Статичные тексты диалогов добавления канала/чата
+ADD_CHANNEL_PROMPT = (
+    "📢 <b>Добавление канала</b>\n\n"
+    "Отправьте username канала (с @ или без)\n"
+    "Например: @svalka_mk\n\n"
+    "/cancel - отмена"
+)
+
+ADD_CHAT_PROMPT = (
+    "💬 <b>Добавление чата</b>\n\n"
+    "Отправьте username чата (с @) или ID чата\n"
+    "Например: @friend или 123456789\n\n"
+    "/cancel - отмена"
+)
+
+CHANNEL_ADDED_TEMPLATE = (
+    "✅ Канал добавлен: <b>{title}</b>\n\n"
+    "Выберите количество последних постов для озвучки:"
+)
+
+CHAT_ADDED_TEMPLATE = (
+    "✅ Чат добавлен: <b>{title}</b>\n\n"
+    "Выберите количество последних сообщений для озвучки:"
+)
+
+NO_CHANNELS_TEXT = "У вас нет отслеживаемых каналов.\n\nИспользуйте кнопку \"➕ Добавить канал\""
+NO_CHATS_TEXT = "У вас нет отслеживаемых чатов.\n\nИспользуйте кнопку \"➕ Добавить чат\""
+MY_CHANNELS_TEXT = "📢 <b>Ваши отслеживаемые каналы:</b>\n\nВыберите канал для озвучки постов:"
+MY_CHATS_TEXT = "💬 <b>Ваши отслеживаемые чаты:</b>\n\nВыберите чат для озвучки сообщений:"
+
 
 @router.callback_query(F.data == "back_to_main")
 async def callback_back_to_main(callback: CallbackQuery, state: FSMContext):
@@ -1198,7 +1692,7 @@ async def callback_back_to_main(callback: CallbackQuery, state: FSMContext):
     await state.clear()
 
     # Редактируем сообщение с главным меню
-    await show_main_menu(callback.message, edit=True)
+    await show_main_menu(callback.message, edit=True, user_id=callback.from_user.id)
 
 
 @router.callback_query(F.data == "help")
@@ -1206,56 +1700,10 @@ async def callback_help(callback: CallbackQuery):
     """Обработчик кнопки Помощь"""
     await callback.answer()
 
-    user_id = callback.from_user.id
-
-    # Получаем текущий голос пользователя
-    voice_name = await get_user_voice(user_id)
-    voice_display = get_voice_display_name(voice_name)
-
-    help_text = f"""
-📖 <b>Помощь по использованию бота</b>
-
-<b>Основные команды:</b>
-/start - Начать работу с ботом
-/menu - Показать главное меню
-/help - Показать эту справку
-/stats - Статистика хранилища
-
-<b>Работа с каналами:</b>
-Используйте кнопки в меню (/menu) или команды:
-/add_channel @username N - Добавить канал
-/my_channels - Список каналов
-/voice_new - Озвучить новые посты
-"""
-
-    if is_owner(user_id):
-        help_text += """
-<b>Работа с чатами (только для владельца):</b>
-/add_chat @username N - Добавить чат
-/my_chats - Список чатов
-"""
-
-    help_text += f"""
-<b>Поддерживаемые форматы документов:</b>
-{', '.join(SUPPORTED_EXTENSIONS)}
-
-<b>Способы озвучки:</b>
-1️⃣ <b>Текст</b> - просто отправьте текст
-2️⃣ <b>Документ</b> - отправьте файл
-3️⃣ <b>Ссылка</b> - отправьте URL
-4️⃣ <b>Пересланное сообщение</b> - перешлите пост
-
-<b>Настройки TTS:</b>
-🎤 Ваш голос: {voice_display}
-⚡ Скорость: {TTS_RATE}
+    help_text = await get_help_text(callback.from_user.id)
 
-💾 Хранилище: {MAX_STORAGE_MB} MB
-"""
     # Редактируем сообщение вместо отправки нового
-    try:
-        await callback.message.edit_text(help_text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
-    except TelegramBadRequest:
-        await callback.message.answer(help_text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
+    await edit_or_answer(callback.message, help_text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
 
 
 @router.callback_query(F.data == "stats")
@@ -1263,21 +1711,9 @@ async def callback_stats(callback: CallbackQuery):
     """Обработчик кнопки Статистика"""
     await callback.answer()
 
-    stats = storage_manager.get_storage_stats()
-
-    stats_text = f"""
-📊 <b>Статистика хранилища</b>
-
-💾 Использовано: {stats['total_size_mb']:.2f} MB / {stats['max_size_mb']:.0f} MB
-📈 Заполнено: {stats['used_percent']:.1f}%
-📁 Файлов: {stats['file_count']}
-✅ Свободно: {stats['available_mb']:.2f} MB
-"""
+    stats_text = STATS_TEXT_TEMPLATE.format_map(await storage_manager.get_storage_stats_async())
     # Редактируем сообщение вместо отправки нового
-    try:
-        await callback.message.edit_text(stats_text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
-    except TelegramBadRequest:
-        await callback.message.answer(stats_text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
+    await edit_or_answer(callback.message, stats_text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
 
 
 @router.callback_query(F.data == "add_channel")
@@ -1285,32 +1721,23 @@ async def callback_add_channel(callback: CallbackQuery, state: FSMContext):
     """Начинает диалог добавления канала"""
     await callback.answer()
 
-    text = (
-        "📢 <b>Добавление канала</b>\n\n"
-        "Отправьте username канала (с @ или без)\n"
-        "Например: @svalka_mk"
-    )
-
     # Редактируем сообщение с кнопкой "Назад"
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
+    await edit_or_answer(callback.message, ADD_CHANNEL_PROMPT, parse_mode="HTML", reply_markup=get_back_button_keyboard())
 
-    # Сохраняем message_id для последующего редактирования
-    await state.update_data(menu_message_id=callback.message.message_id)
+    # Сохраняем message_id для последующего редактирования. Диалог начинается с
+    # чистых данных, поэтому set_data: без чтения и слияния, как в update_data
+    await state.set_data({'menu_message_id': callback.message.message_id})
     await state.set_state(AddChannelStates.waiting_for_username)
 
 
-@router.message(StateFilter(AddChannelStates.waiting_for_username))
+@add_channel_router.message(AddChannelStates.waiting_for_username)
 async def process_channel_username(message: Message, state: FSMContext):
     """Обрабатывает username канала и добавляет его в БД"""
     channel_username = message.text.strip()
     user_id = message.from_user.id
 
-    # Получаем message_id меню из state
-    data = await state.get_data()
-    menu_message_id = data.get('menu_message_id')
+    # Получаем message_id меню из state (читаем одно поле, а не весь словарь данных)
+    menu_message_id = await state.get_value('menu_message_id')
 
     try:
         # Проверяем существование канала через Telethon
@@ -1332,10 +1759,7 @@ async def process_channel_username(message: Message, state: FSMContext):
         )
 
         # Редактируем меню с выбором количества постов
-        text = (
-            f"✅ Канал добавлен: <b>{channel_title}</b>\n\n"
-            "Выберите количество последних постов для озвучки:"
-        )
+        text = CHANNEL_ADDED_TEMPLATE.format(title=channel_title)
 
         keyboard = get_posts_count_keyboard(channel_username.lstrip('@'))
 
@@ -1365,7 +1789,7 @@ async def process_channel_username(message: Message, state: FSMContext):
         await state.clear()
 
     except Exception as e:
-        logger.error(f"Ошибка при добавлении канала: {e}")
+        logger.error("Ошибка при добавлении канала: %s", e)
         await message.answer(f"❌ Ошибка: {str(e)}")
 
 
@@ -1381,7 +1805,10 @@ async def callback_voice_channel(callback: CallbackQuery):
         return
 
     channel_username = parts[1]
-    count = int(parts[2])
+    count = parse_messages_count(parts[2])
+    if count <= 0:
+        await callback.message.edit_text("❌ Ошибка: неверный формат данных")
+        return
     user_id = callback.from_user.id
 
     # Обновляем сообщение о начале озвучки
@@ -1421,10 +1848,10 @@ async def callback_voice_channel(callback: CallbackQuery):
         )
 
         # После озвучки возвращаемся в главное меню
-        await show_main_menu(callback.message, edit=True)
+        await show_main_menu(callback.message, edit=True, user_id=callback.from_user.id)
 
     except Exception as e:
-        logger.error(f"Ошибка при озвучке канала: {e}")
+        logger.error("Ошибка при озвучке канала: %s", e)
         await callback.message.edit_text(f"❌ Ошибка: {str(e)}")
 
 
@@ -1439,32 +1866,23 @@ async def callback_add_chat(callback: CallbackQuery, state: FSMContext):
 
     await callback.answer()
 
-    text = (
-        "💬 <b>Добавление чата</b>\n\n"
-        "Отправьте username чата (с @) или ID чата\n"
-        "Например: @friend или 123456789"
-    )
-
     # Редактируем сообщение с кнопкой "Назад"
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
+    await edit_or_answer(callback.message, ADD_CHAT_PROMPT, parse_mode="HTML", reply_markup=get_back_button_keyboard())
 
-    # Сохраняем message_id для последующего редактирования
-    await state.update_data(menu_message_id=callback.message.message_id)
+    # Сохраняем message_id для последующего редактирования. Диалог начинается с
+    # чистых данных, поэтому set_data: без чтения и слияния, как в update_data
+    await state.set_data({'menu_message_id': callback.message.message_id})
     await state.set_state(AddChatStates.waiting_for_identifier)
 
 
-@router.message(StateFilter(AddChatStates.waiting_for_identifier))
+@add_chat_router.message(AddChatStates.waiting_for_identifier)
 async def process_chat_identifier(message: Message, state: FSMContext):
     """Обрабатывает username/ID чата и добавляет его в БД"""
     chat_identifier = message.text.strip()
     user_id = message.from_user.id
 
-    # Получаем message_id меню из state
-    data = await state.get_data()
-    menu_message_id = data.get('menu_message_id')
+    # Получаем message_id меню из state (читаем одно поле, а не весь словарь данных)
+    menu_message_id = await state.get_value('menu_message_id')
 
     try:
         # Проверяем существование чата через Telethon
@@ -1486,10 +1904,7 @@ async def process_chat_identifier(message: Message, state: FSMContext):
         )
 
         # Редактируем меню с выбором количества сообщений
-        text = (
-            f"✅ Чат добавлен: <b>{chat_title}</b>\n\n"
-            "Выберите количество последних сообщений для озвучки:"
-        )
+        text = CHAT_ADDED_TEMPLATE.format(title=chat_title)
 
         keyboard = get_messages_count_keyboard(chat_id)
 
@@ -1519,7 +1934,7 @@ async def process_chat_identifier(message: Message, state: FSMContext):
         await state.clear()
 
     except Exception as e:
-        logger.error(f"Ошибка при добавлении чата: {e}")
+        logger.error("Ошибка при добавлении чата: %s", e)
         await message.answer(f"❌ Ошибка: {str(e)}")
 
 
@@ -1535,7 +1950,10 @@ async def callback_voice_chat(callback: CallbackQuery):
         return
 
     chat_id = int(parts[1])
-    count = int(parts[2])
+    count = parse_messages_count(parts[2])
+    if count <= 0:
+        await callback.message.edit_text("❌ Ошибка: неверный формат данных")
+        return
     user_id = callback.from_user.id
 
     # Обновляем сообщение о начале озвучки
@@ -1575,10 +1993,10 @@ async def callback_voice_chat(callback: CallbackQuery):
         )
 
         # После озвучки возвращаемся в главное меню
-        await show_main_menu(callback.message, edit=True)
+        await show_main_menu(callback.message, edit=True, user_id=callback.from_user.id)
 
     except Exception as e:
-        logger.error(f"Ошибка при озвучке чата: {e}")
+        logger.error("Ошибка при озвучке чата: %s", e)
         await callback.message.edit_text(f"❌ Ошибка: {str(e)}")
 
 
@@ -1591,21 +2009,15 @@ async def callback_my_channels(callback: CallbackQuery):
     channels = await get_tracked_channels(user_id)
 
     if not channels:
-        text = "У вас нет отслеживаемых каналов.\n\nИспользуйте кнопку \"➕ Добавить канал\""
-        try:
-            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
-        except TelegramBadRequest:
-            await callback.message.answer(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
+        text = NO_CHANNELS_TEXT
+        await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
         return
 
-    text = "📢 <b>Ваши отслеживаемые каналы:</b>\n\nВыберите канал для озвучки постов:"
+    text = MY_CHANNELS_TEXT
     keyboard = get_my_channels_keyboard(channels)
 
     # Редактируем сообщение
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("channel:"))
@@ -1620,10 +2032,7 @@ async def callback_channel_select(callback: CallbackQuery):
     keyboard = get_posts_count_keyboard(channel_username)
 
     # Редактируем сообщение
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=keyboard)
 
 
 @router.callback_query(F.data == "my_chats")
@@ -1640,21 +2049,15 @@ async def callback_my_chats(callback: CallbackQuery):
     chats = await get_tracked_chats(user_id)
 
     if not chats:
-        text = "У вас нет отслеживаемых чатов.\n\nИспользуйте кнопку \"➕ Добавить чат\""
-        try:
-            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
-        except TelegramBadRequest:
-            await callback.message.answer(text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
+        text = NO_CHATS_TEXT
+        await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=get_back_button_keyboard())
         return
 
-    text = "💬 <b>Ваши отслеживаемые чаты:</b>\n\nВыберите чат для озвучки сообщений:"
+    text = MY_CHATS_TEXT
     keyboard = get_my_chats_keyboard(chats)
 
     # Редактируем сообщение
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("chat:"))
@@ -1669,10 +2072,7 @@ async def callback_chat_select(callback: CallbackQuery):
     keyboard = get_messages_count_keyboard(chat_id)
 
     # Редактируем сообщение
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=keyboard)
 
 
 @router.callback_query(F.data == "voice_new")
@@ -1683,80 +2083,21 @@ async def callback_voice_new(callback: CallbackQuery):
     user_id = callback.from_user.id
 
     # Редактируем сообщение вместо создания нового
-    try:
-        await callback.message.edit_text("⏳ Проверяю новые сообщения...")
-    except TelegramBadRequest:
-        await callback.message.answer("⏳ Проверяю новые сообщения...")
+    await edit_or_answer(callback.message, "⏳ Проверяю новые сообщения...")
 
     try:
-        telethon = await get_telethon_service()
-
         channels = await get_tracked_channels(user_id)
 
-        chats = []
-        if is_owner(user_id):
-            chats = await get_tracked_chats(user_id)
+        chats = await get_tracked_chats(user_id) if is_owner(user_id) else ()
 
         if not channels and not chats:
             text = "❌ У вас нет отслеживаемых каналов или чатов!\n\nИспользуйте кнопку '➕ Добавить канал' в меню"
             await callback.message.edit_text(text, reply_markup=get_back_button_keyboard())
             return
 
-        total_new_messages = 0
-
-        for channel in channels:
-            last_msg_id = await get_last_voiced_message_id(user_id, 'channel', channel.channel_id)
-
-            messages = await telethon.get_channel_messages(
-                channel.channel_username,
-                limit=100,
-                min_id=last_msg_id
-            )
-
-            if messages:
-                await callback.message.edit_text(
-                    f"📢 Канал: {channel.channel_title}\n"
-                    f"⏳ Озвучиваю {len(messages)} новых сообщений..."
-                )
-
-                await voice_messages(
-                    callback.message,
-                    messages,
-                    user_id,
-                    source_type='channel',
-                    source_id=channel.channel_id,
-                    status_msg=None,
-                    source_title=channel.channel_title
-                )
-
-                total_new_messages += len(messages)
-
-        for chat in chats:
-            last_msg_id = await get_last_voiced_message_id(user_id, 'chat', chat.chat_id)
-
-            messages = await telethon.get_chat_messages(
-                chat.chat_id,
-                limit=100,
-                min_id=last_msg_id
-            )
-
-            if messages:
-                await callback.message.edit_text(
-                    f"💬 Чат: {chat.chat_title}\n"
-                    f"⏳ Озвучиваю {len(messages)} новых сообщений..."
-                )
-
-                await voice_messages(
-                    callback.message,
-                    messages,
-                    user_id,
-                    source_type='chat',
-                    source_id=chat.chat_id,
-                    status_msg=None,
-                    source_title=chat.chat_title
-                )
-
-                total_new_messages += len(messages)
+        total_new_messages = await voice_new_sources(
+            callback.message, callback.message, user_id, channels, chats
+        )
 
         # Показываем результат и возвращаемся в главное меню
         if total_new_messages == 0:
@@ -1771,7 +2112,7 @@ async def callback_voice_new(callback: CallbackQuery):
             )
 
     except Exception as e:
-        logger.error(f"Ошибка при озвучке новых сообщений: {e}")
+        logger.error("Ошибка при озвучке новых сообщений: %s", e)
         await callback.message.edit_text(
             f"❌ Ошибка: {str(e)}",
             reply_markup=get_back_button_keyboard()
@@ -1788,17 +2129,17 @@ async def cmd_add_user(message: Message):
     Формат: /add_user <user_id|@username>
     """
     user_id = message.from_user.id
-    logger.info(f"cmd_add_user called by user_id={user_id}, OWNER_ID={OWNER_ID}")
+    logger.info("cmd_add_user called by user_id=%s, OWNER_ID=%s", user_id, OWNER_ID)
 
     # Проверяем права доступа
     if not is_owner(user_id):
-        logger.warning(f"Access denied for user_id={user_id} (not owner)")
+        logger.warning("Access denied for user_id=%s (not owner)", user_id)
         await message.answer("❌ Эта команда доступна только владельцу бота!")
         return
 
     # Парсим команду
     text = message.text.strip()
-    parts = text.split()
+    parts = text.split(maxsplit=3)
 
     if len(parts) < 2:
         await message.answer(
@@ -1847,7 +2188,7 @@ async def cmd_add_user(message: Message):
         )
 
     except Exception as e:
-        logger.error(f"Ошибка при добавлении пользователя в белый список: {e}")
+        logger.error("Ошибка при добавлении пользователя в белый список: %s", e)
         await processing_msg.edit_text(f"❌ Ошибка при добавлении пользователя: {str(e)}")
 
 
@@ -1866,7 +2207,7 @@ async def cmd_remove_user(message: Message):
 
     # Парсим команду
     text = message.text.strip()
-    parts = text.split()
+    parts = text.split(maxsplit=3)
 
     if len(parts) < 2:
         await message.answer(
@@ -1893,7 +2234,7 @@ async def cmd_remove_user(message: Message):
             )
 
     except Exception as e:
-        logger.error(f"Ошибка при удалении пользователя из белого списка: {e}")
+        logger.error("Ошибка при удалении пользователя из белого списка: %s", e)
         await processing_msg.edit_text(f"❌ Ошибка при удалении пользователя: {str(e)}")
 
 
@@ -1914,7 +2255,7 @@ async def cmd_user_list(message: Message):
             await message.answer("📝 Белый список пустой.")
             return
 
-        text = "📝 <b>Пользователи в белом списке:</b>\n\n"
+        lines = ["📝 <b>Пользователи в белом списке:</b>\n\n"]
 
         for idx, user in enumerate(whitelisted_users, 1):
             # Формируем имя пользователя
@@ -1930,14 +2271,16 @@ async def cmd_user_list(message: Message):
             else:
                 full_name = f"ID: {user.user_id}"
 
-            text += f"{idx}. {full_name}\n"
-            text += f"   🆔 ID: {user.user_id}\n"
-            text += f"   📅 Добавлен: {user.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+            lines.append(
+                f"{idx}. {full_name}\n"
+                f"   🆔 ID: {user.user_id}\n"
+                f"   📅 Добавлен: {user.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+            )
 
-        await message.answer(text, parse_mode="HTML")
+        await message.answer("".join(lines), parse_mode="HTML")
 
     except Exception as e:
-        logger.error(f"Ошибка при получении списка пользователей: {e}")
+        logger.error("Ошибка при получении списка пользователей: %s", e)
         await message.answer(f"❌ Ошибка при получении списка: {str(e)}")
 
 
@@ -1952,39 +2295,34 @@ async def callback_select_voice(callback: CallbackQuery):
     text = "🎤 <b>Выбор голоса</b>\n\nВыберите голос для озвучивания:"
     keyboard = get_voice_selection_keyboard()
 
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("set_voice:"))
 async def callback_set_voice(callback: CallbackQuery):
     """Обрабатывает выбор голоса"""
-    await callback.answer()
-
     # Парсим callback_data: set_voice:voice_id
     voice_id = callback.data.split(":", 1)[1]
     user_id = callback.from_user.id
 
+    if voice_id not in AVAILABLE_VOICE_KEYS:
+        await callback.answer("❌ Неизвестный голос", show_alert=True)
+        return
+
+    await callback.answer()
+
     # Сохраняем голос
     await set_user_voice(user_id, voice_id)
 
-    voice_name = AVAILABLE_VOICES[voice_id]["name"]
+    voice_name = VOICE_DISPLAY_NAMES[voice_id]
     text = f"✅ <b>Голос сохранен!</b>\n\n🎤 {voice_name}"
 
-    try:
-        await callback.message.edit_text(
-            text,
-            parse_mode="HTML",
-            reply_markup=get_back_button_keyboard()
-        )
-    except TelegramBadRequest:
-        await callback.message.answer(
-            text,
-            parse_mode="HTML",
-            reply_markup=get_back_button_keyboard()
-        )
+    await edit_or_answer(
+        callback.message,
+        text,
+        parse_mode="HTML",
+        reply_markup=get_back_button_keyboard()
+    )
 
 
 # ===== ОБРАБОТЧИКИ ВЫБОРА СКОРОСТИ РЕЧИ =====
@@ -1999,46 +2337,39 @@ async def callback_select_rate(callback: CallbackQuery):
     current_rate = await get_user_rate(user_id)
 
     # Форматируем текущую настройку
-    from config import AVAILABLE_RATES
     rate_text = AVAILABLE_RATES.get(current_rate, current_rate)
 
     text = f"⚡ <b>Скорость речи</b>\n\nТекущая настройка: {rate_text}\n\nВыберите новое значение:"
     keyboard = get_rate_selection_keyboard()
 
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=keyboard)
 
 
 @router.callback_query(F.data.startswith("set_rate:"))
 async def callback_set_rate(callback: CallbackQuery):
     """Обрабатывает выбор скорости речи"""
-    await callback.answer()
-
     # Парсим callback_data: set_rate:rate_value
     rate_value = callback.data.split(":", 1)[1]
     user_id = callback.from_user.id
 
+    if rate_value not in AVAILABLE_RATE_KEYS:
+        await callback.answer("❌ Неизвестное значение скорости", show_alert=True)
+        return
+
+    await callback.answer()
+
     # Сохраняем настройку
     await set_user_rate(user_id, rate_value)
 
-    from config import AVAILABLE_RATES
     rate_label = AVAILABLE_RATES.get(rate_value, rate_value)
     text = f"✅ <b>Настройка сохранена!</b>\n\n⚡ Скорость речи: {rate_label}"
 
-    try:
-        await callback.message.edit_text(
-            text,
-            parse_mode="HTML",
-            reply_markup=get_back_button_keyboard()
-        )
-    except TelegramBadRequest:
-        await callback.message.answer(
-            text,
-            parse_mode="HTML",
-            reply_markup=get_back_button_keyboard()
-        )
+    await edit_or_answer(
+        callback.message,
+        text,
+        parse_mode="HTML",
+        reply_markup=get_back_button_keyboard()
+    )
 
 
 # ===== ОБРАБОТЧИКИ ВЫБОРА ДЛИТЕЛЬНОСТИ АУДИО =====
@@ -2056,23 +2387,39 @@ async def callback_select_duration(callback: CallbackQuery):
     if current_duration is None:
         duration_text = "♾️ Без лимита"
     else:
-        from config import AVAILABLE_DURATIONS
         duration_text = AVAILABLE_DURATIONS.get(current_duration, f"{current_duration} минут")
 
     text = f"⏱ <b>Максимальная длительность аудио</b>\n\nТекущая настройка: {duration_text}\n\nВыберите новое значение:"
     keyboard = get_duration_selection_keyboard()
 
-    try:
-        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
-    except TelegramBadRequest:
-        await callback.message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+    await edit_or_answer(callback.message, text, parse_mode="HTML", reply_markup=keyboard)
+
+
+def _build_duration_saved_text(duration_minutes) -> str:
+    """Формирует подтверждение сохранения длительности аудио."""
+    duration_label = AVAILABLE_DURATIONS[duration_minutes]
+    if duration_minutes is None:
+        details = "Текст любой длины будет синтезирован в один аудиофайл."
+    else:
+        details = f"Если текст превышает {duration_label}, он будет автоматически разбит на несколько аудиофайлов."
+
+    return (
+        f"✅ <b>Настройка сохранена!</b>\n\n"
+        f"⏱ Максимальная длительность аудио: {duration_label}\n\n"
+        f"{details}"
+    )
+
+
+# Набор длительностей фиксирован - тексты подтверждений собираются один раз при импорте
+DURATION_SAVED_TEXTS = {
+    duration_minutes: _build_duration_saved_text(duration_minutes)
+    for duration_minutes in AVAILABLE_DURATION_KEYS
+}
 
 
 @router.callback_query(F.data.startswith("set_duration:"))
 async def callback_set_duration(callback: CallbackQuery):
     """Обрабатывает выбор длительности"""
-    await callback.answer()
-
     # Парсим callback_data: set_duration:duration_value
     duration_value = callback.data.split(":", 1)[1]
     user_id = callback.from_user.id
@@ -2080,31 +2427,24 @@ async def callback_set_duration(callback: CallbackQuery):
     # Преобразуем значение
     if duration_value == "unlimited":
         duration_minutes = None
-        duration_label = "♾️ Без лимита"
-    else:
+    elif duration_value.isdigit():
         duration_minutes = int(duration_value)
-        from config import AVAILABLE_DURATIONS
-        duration_label = AVAILABLE_DURATIONS.get(duration_minutes, f"{duration_minutes} минут")
+    else:
+        duration_minutes = -1
 
-    # Сохраняем настройку
-    await set_user_max_duration(user_id, duration_minutes)
+    if duration_minutes not in AVAILABLE_DURATION_KEYS:
+        await callback.answer("❌ Неизвестное значение длительности", show_alert=True)
+        return
 
-    text = f"✅ <b>Настройка сохранена!</b>\n\n⏱ Максимальная длительность аудио: {duration_label}\n\n"
+    await callback.answer()
 
-    if duration_minutes is None:
-        text += "Текст любой длины будет синтезирован в один аудиофайл."
-    else:
-        text += f"Если текст превышает {duration_label}, он будет автоматически разбит на несколько аудиофайлов."
+    # Сохраняем настройку
+    await set_user_max_duration(user_id, duration_minutes)
 
-    try:
-        await callback.message.edit_text(
-            text,
-            parse_mode="HTML",
-            reply_markup=get_back_button_keyboard()
-        )
-    except TelegramBadRequest:
-        await callback.message.answer(
-            text,
-            parse_mode="HTML",
-            reply_markup=get_back_button_keyboard()
-        )
+    text = DURATION_SAVED_TEXTS[duration_minutes]
+    await edit_or_answer(
+        callback.message,
+        text,
+        parse_mode="HTML",
+        reply_markup=get_back_button_keyboard()
+    )
@@ -3,15 +3,15 @@
 """
 
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config import OWNER_ID
+from config import OWNER_ID, AVAILABLE_VOICES, AVAILABLE_RATES, AVAILABLE_DURATIONS
 
 
-def get_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
+def _build_main_menu_keyboard(is_owner: bool) -> InlineKeyboardMarkup:
     """
     Создает главное меню с inline кнопками.
 
     Args:
-        user_id: ID пользователя (для проверки прав доступа)
+        is_owner: Добавить кнопки, доступные только владельцу
 
     Returns:
         InlineKeyboardMarkup с кнопками главного меню
@@ -29,7 +29,7 @@ def get_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
     ])
 
     # Кнопки для чатов (только для владельца)
-    if user_id == OWNER_ID:
+    if is_owner:
         keyboard.append([
             InlineKeyboardButton(text="➕ Добавить чат", callback_data="add_chat"),
             InlineKeyboardButton(text="💬 Мои чаты", callback_data="my_chats")
@@ -56,17 +56,35 @@ def get_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_back_button_keyboard() -> InlineKeyboardMarkup:
+def get_main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
     """
-    Создает клавиатуру только с кнопкой "Назад".
+    Возвращает главное меню с inline кнопками.
+
+    Args:
+        user_id: ID пользователя (для проверки прав доступа)
 
     Returns:
-        InlineKeyboardMarkup с кнопкой "Назад"
+        InlineKeyboardMarkup с кнопками главного меню
     """
+    return MAIN_MENU_OWNER_KEYBOARD if user_id == OWNER_ID else MAIN_MENU_USER_KEYBOARD
+
+
+def _build_back_button_keyboard() -> InlineKeyboardMarkup:
+    """Создает клавиатуру только с кнопкой "Назад"."""
     keyboard = [[InlineKeyboardButton(text="◀️ Назад", callback_data="back_to_main")]]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def get_back_button_keyboard() -> InlineKeyboardMarkup:
+    """
+    Возвращает клавиатуру только с кнопкой "Назад".
+
+    Returns:
+        InlineKeyboardMarkup с кнопкой "Назад"
+    """
+    return BACK_BUTTON_KEYBOARD
+
+
 def get_posts_count_keyboard(channel_username: str) -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для выбора количества постов.
@@ -179,15 +197,13 @@ def get_my_chats_keyboard(chats: list) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_voice_selection_keyboard() -> InlineKeyboardMarkup:
+def _build_voice_selection_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для выбора голоса.
 
     Returns:
         InlineKeyboardMarkup с кнопками выбора голосов
     """
-    from config import AVAILABLE_VOICES
-
     keyboard = []
 
     # Кнопки для каждого голоса
@@ -205,15 +221,13 @@ def get_voice_selection_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_duration_selection_keyboard() -> InlineKeyboardMarkup:
+def _build_duration_selection_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для выбора максимальной длительности аудио.
 
     Returns:
         InlineKeyboardMarkup с кнопками выбора длительности
     """
-    from config import AVAILABLE_DURATIONS
-
     keyboard = []
 
     # Кнопки для каждого варианта длительности
@@ -233,15 +247,13 @@ def get_duration_selection_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_rate_selection_keyboard() -> InlineKeyboardMarkup:
+def _build_rate_selection_keyboard() -> InlineKeyboardMarkup:
     """
     Создает клавиатуру для выбора скорости речи.
 
     Returns:
         InlineKeyboardMarkup с кнопками выбора скорости
     """
-    from config import AVAILABLE_RATES
-
     keyboard = []
 
     # Кнопки для каждого варианта скорости
@@ -259,3 +271,26 @@ def get_rate_selection_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+# Статические клавиатуры не меняются во время работы бота,
+# поэтому строятся один раз при импорте модуля
+MAIN_MENU_OWNER_KEYBOARD = _build_main_menu_keyboard(is_owner=True)
+MAIN_MENU_USER_KEYBOARD = _build_main_menu_keyboard(is_owner=False)
+BACK_BUTTON_KEYBOARD = _build_back_button_keyboard()
+VOICES_KEYBOARD = _build_voice_selection_keyboard()
+RATES_KEYBOARD = _build_rate_selection_keyboard()
+DURATIONS_KEYBOARD = _build_duration_selection_keyboard()
+
+
+def get_voice_selection_keyboard() -> InlineKeyboardMarkup:
+    """Возвращает клавиатуру выбора голоса."""
+    return VOICES_KEYBOARD
+
+
+def get_rate_selection_keyboard() -> InlineKeyboardMarkup:
+    """Возвращает клавиатуру выбора скорости речи."""
+    return RATES_KEYBOARD
+
+
+def get_duration_selection_keyboard() -> InlineKeyboardMarkup:
+    """Возвращает клавиатуру выбора максимальной длительности аудио."""
+    return DURATIONS_KEYBOARD
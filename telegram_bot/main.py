@@ -39,11 +39,11 @@ from config import (
     TELETHON_SESSION,
     OWNER_ID  # <-- ДОБАВЛЕНО: импортируем ID владельца
 )
-from database import init_db
-from handlers import router
+from database import init_db, close_db
+from handlers import router, shutdown_parse_pool
 from telethon_service import init_telethon_service, stop_telethon_service
 # --- ИЗМЕНЕНО: теперь используем новый middleware ---
-from middlewares import SubscriptionCheckMiddleware
+from middlewares import SubscriptionCheckMiddleware, UserContextMiddleware
 # -----------------------------------------------
 
 # Настройка логирования
@@ -78,6 +78,7 @@ async def set_bot_commands(bot: Bot):
         BotCommand(command="menu", description="🎛 Главное меню"),
         BotCommand(command="help", description="📖 Помощь"),
         BotCommand(command="stats", description="📊 Статистика"),
+        BotCommand(command="cancel", description="❌ Отменить действие"),
     ]
     await bot.set_my_commands(user_commands, scope=BotCommandScopeDefault())
     logger.info("✓ Установлены команды для обычных пользователей.")
@@ -91,7 +92,7 @@ async def set_bot_commands(bot: Bot):
         BotCommand(command="user_list", description="📝 Список пользователей (админ)"),
     ]
     await bot.set_my_commands(owner_commands, scope=BotCommandScopeChat(chat_id=OWNER_ID))
-    logger.info(f"✓ Установлены расширенные команды для владельца (ID: {OWNER_ID}).")
+    logger.info("✓ Установлены расширенные команды для владельца (ID: %s).", OWNER_ID)
 
 # ---------------------------------------------------
 
@@ -100,7 +101,7 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot):
     """Выполняется при старте бота"""
     # Создаем директорию для аудио
     AUDIO_DIR.mkdir(parents=True, exist_ok=True)
-    logger.info(f"✓ Директория для аудио: {AUDIO_DIR}")
+    logger.info("✓ Директория для аудио: %s", AUDIO_DIR)
 
     # Инициализируем базу данных
     await init_db()
@@ -120,7 +121,7 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot):
             )
             logger.info("✓ Telethon сервис инициализирован")
         except Exception as e:
-            logger.error(f"✗ Ошибка Telethon: {e}")
+            logger.error("✗ Ошибка Telethon: %s", e)
             logger.warning("Функции работы с каналами и чатами будут недоступны!")
     else:
         logger.warning("TELETHON_API_ID не установлен. Получите его на https://my.telegram.org")
@@ -130,6 +131,8 @@ async def on_startup(dispatcher: Dispatcher, bot: Bot):
 async def on_shutdown(dispatcher: Dispatcher, bot: Bot):
     """Выполняется при остановке бота"""
     await stop_telethon_service()
+    await close_db()
+    shutdown_parse_pool()
     logger.info("✓ Бот остановлен")
 
 
@@ -185,6 +188,9 @@ async def main():
     dp.message.middleware(subscription_middleware)
     dp.callback_query.middleware(subscription_middleware)
 
+    # Контекст пользователя (user_id, username) для обработчиков сообщений
+    dp.message.middleware(UserContextMiddleware())
+
     # Регистрируем роутер с обработчиками
     dp.include_router(router)
 
@@ -200,14 +206,14 @@ async def main():
             await bot.delete_webhook(drop_pending_updates=True)
             logger.info("✓ Webhook удален")
         except Exception as e:
-            logger.warning(f"Не удалось удалить webhook (пропускаем): {e}")
+            logger.warning("Не удалось удалить webhook (пропускаем): %s", e)
 
         # Запускаем polling
         await dp.start_polling(bot, polling_timeout=20, handle_signals=True)
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     except Exception as e:
-        logger.error(f"✗ Ошибка при работе бота: {e}")
+        logger.error("✗ Ошибка при работе бота: %s", e)
         raise
 
 
@@ -14,6 +14,9 @@ from config import REQUIRED_CHANNEL_ID, OWNER_ID
 
 logger = logging.getLogger(__name__)
 
+# Статусы участника, при которых пользователь не считается подписчиком канала
+UNSUBSCRIBED_STATUSES = frozenset(("left", "kicked"))
+
 
 class SubscriptionCheckMiddleware(BaseMiddleware):
     """
@@ -38,11 +41,11 @@ class SubscriptionCheckMiddleware(BaseMiddleware):
 
         # Логируем для отладки
         if isinstance(event, Message) and event.text:
-            logger.info(f"Middleware: user_id={user_id}, OWNER_ID={OWNER_ID}, text='{event.text[:50]}'")
+            logger.info("Middleware: user_id=%s, OWNER_ID=%s, text='%s'", user_id, OWNER_ID, event.text[:50])
 
         # Владелец бота имеет полный доступ без проверок
         if user_id == OWNER_ID:
-            logger.info(f"Owner detected! Allowing access for user_id={user_id}")
+            logger.info("Owner detected! Allowing access for user_id=%s", user_id)
             return await handler(event, data)
 
         # Проверяем белый список
@@ -63,7 +66,7 @@ class SubscriptionCheckMiddleware(BaseMiddleware):
         # Выполняем проверку подписки через API бота
         try:
             member = await bot.get_chat_member(chat_id=REQUIRED_CHANNEL_ID, user_id=user_id)
-            is_subscribed = member.status not in ["left", "kicked"]
+            is_subscribed = member.status not in UNSUBSCRIBED_STATUSES
 
             # Обновляем кэш
             self._subscription_cache[user_id] = (is_subscribed, datetime.now())
@@ -76,11 +79,11 @@ class SubscriptionCheckMiddleware(BaseMiddleware):
             return None  # Прерываем выполнение
 
         except TelegramBadRequest as e:
-            logger.error(f"Ошибка при проверке подписки (get_chat_member) для {user_id} в {REQUIRED_CHANNEL_ID}: {e}")
+            logger.error("Ошибка при проверке подписки (get_chat_member) для %s в %s: %s", user_id, REQUIRED_CHANNEL_ID, e)
             await self._send_error_message(event)
             return None
         except Exception as e:
-            logger.error(f"Критическая ошибка при проверке подписки для {user_id}: {e}")
+            logger.error("Критическая ошибка при проверке подписки для %s: %s", user_id, e)
             return await handler(event, data)
 
     async def _send_subscription_message(self, event: Message | CallbackQuery):
@@ -106,4 +109,24 @@ class SubscriptionCheckMiddleware(BaseMiddleware):
         if isinstance(event, Message):
             await event.answer(error_text)
         elif isinstance(event, CallbackQuery):
-            await event.answer(error_text, show_alert=True)
\ No newline at end of file
+            await event.answer(error_text, show_alert=True)
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """
+    Middleware, один раз извлекающий (user_id, username) из сообщения.
+
+    Обработчики получают кортеж через параметр uctx вместо повторного
+    разбора message.from_user в каждом из них.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = event.from_user
+        if user is not None:
+            data['uctx'] = (user.id, user.username or user.first_name)
+        return await handler(event, data)
@@ -0,0 +1,143 @@
+"""
+Миграции схемы базы данных
+
+Заменяет отдельные скрипты create_whitelist_table.py, fix_user_settings.py
+и fix_rate_zero_percent.py. Примененные версии хранятся в таблице
+schema_migrations, поэтому повторный запуск сводится к одному SELECT max(version).
+
+Вызывается автоматически из init_db(), можно запустить и вручную:
+python migrate.py
+"""
+
+from typing import List, Tuple
+
+from config import TTS_VOICE, TTS_RATE
+from _sqlite_util import connect
+
+# Таблица с примененными версиями миграций
+CREATE_SCHEMA_MIGRATIONS_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# 1: таблица whitelisted_users (бывший create_whitelist_table.py)
+CREATE_WHITELIST_SQL = """
+CREATE TABLE IF NOT EXISTS whitelisted_users (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    user_id BIGINT NOT NULL UNIQUE,
+    username VARCHAR(255),
+    first_name VARCHAR(255),
+    last_name VARCHAR(255),
+    added_by BIGINT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_whitelisted_users_user_id ON whitelisted_users (user_id);
+CREATE INDEX IF NOT EXISTS ix_whitelisted_users_created_at ON whitelisted_users (created_at);
+"""
+
+# 2: дефолтные значения для NULL/пустых полей user_settings (бывший fix_user_settings.py)
+FIX_USER_SETTINGS_SQL = f"""
+UPDATE user_settings
+SET speech_rate = COALESCE(NULLIF(speech_rate, ''), '{TTS_RATE}'),
+    voice_name = COALESCE(NULLIF(voice_name, ''), '{TTS_VOICE}')
+WHERE speech_rate IS NULL OR speech_rate = '' OR voice_name IS NULL OR voice_name = '';
+"""
+
+# 3: Edge TTS не принимает '0%', только '+0%' (бывший fix_rate_zero_percent.py)
+FIX_RATE_ZERO_PERCENT_SQL = """
+UPDATE user_settings
+SET speech_rate = '+0%'
+WHERE speech_rate = '0%';
+"""
+
+# 4: дубликаты подписок, которые допускали старые обработчики добавления.
+# Уникальные индексы uq_tracked_* (нужны для UPSERT) на таких данных не создаются,
+# поэтому остается самая ранняя запись, активная, если активна хоть одна из копий
+DEDUPLICATE_TRACKED_SQL = """
+UPDATE tracked_channels
+SET is_active = 1
+WHERE is_active = 0
+  AND id IN (SELECT MIN(id) FROM tracked_channels GROUP BY user_id, channel_username)
+  AND EXISTS (
+      SELECT 1 FROM tracked_channels AS dup
+      WHERE dup.user_id = tracked_channels.user_id
+        AND dup.channel_username = tracked_channels.channel_username
+        AND dup.is_active = 1
+  );
+DELETE FROM tracked_channels
+WHERE id NOT IN (SELECT MIN(id) FROM tracked_channels GROUP BY user_id, channel_username);
+
+UPDATE tracked_chats
+SET is_active = 1
+WHERE is_active = 0
+  AND id IN (SELECT MIN(id) FROM tracked_chats GROUP BY user_id, chat_id)
+  AND EXISTS (
+      SELECT 1 FROM tracked_chats AS dup
+      WHERE dup.user_id = tracked_chats.user_id
+        AND dup.chat_id = tracked_chats.chat_id
+        AND dup.is_active = 1
+  );
+DELETE FROM tracked_chats
+WHERE id NOT IN (SELECT MIN(id) FROM tracked_chats GROUP BY user_id, chat_id);
+"""
+
+# Упорядоченный список миграций: (версия, SQL)
+MIGRATIONS: List[Tuple[int, str]] = [
+    (1, CREATE_WHITELIST_SQL),
+    (2, FIX_USER_SETTINGS_SQL),
+    (3, FIX_RATE_ZERO_PERCENT_SQL),
+    (4, DEDUPLICATE_TRACKED_SQL),
+]
+
+
+def run_migrations() -> int:
+    """
+    Применяет все еще не примененные миграции одной транзакцией.
+
+    Ожидает, что основные таблицы уже созданы (Base.metadata.create_all).
+
+    Returns:
+        Количество примененных миграций
+    """
+    conn = connect()
+
+    try:
+        conn.executescript(CREATE_SCHEMA_MIGRATIONS_SQL)
+        current_version = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()[0] or 0
+
+        pending = [(version, sql) for version, sql in MIGRATIONS if version > current_version]
+        if not pending:
+            return 0
+
+        script = ["BEGIN;"]
+        for version, sql in pending:
+            script.append(sql)
+            script.append(f"INSERT INTO schema_migrations (version) VALUES ({version});")
+        script.append("COMMIT;")
+
+        # Количество затронутых строк берем из total_changes вместо отдельных SELECT COUNT(*)
+        changes_before = conn.total_changes
+        try:
+            conn.executescript("\n".join(script))
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+        changed_rows = conn.total_changes - changes_before - len(pending)
+        print(
+            f"[DB] Применены миграции: {', '.join(str(version) for version, _ in pending)} "
+            f"(изменено строк: {changed_rows})"
+        )
+        return len(pending)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    applied = run_migrations()
+    if applied == 0:
+        print("✅ Схема актуальна, миграции не требуются.")
@@ -13,8 +13,8 @@ import sqlite3
 import sys
 from pathlib import Path
 
-# Database path - same as in config.py
-DB_PATH = Path(__file__).parent / "bot_history.db"
+from config import DB_PATH
+from _sqlite_util import connect
 
 
 def column_exists(cursor, table_name: str, column_name: str) -> bool:
@@ -36,7 +36,7 @@ def main():
 
     try:
         # Connect to the database
-        conn = sqlite3.connect(str(db_path))
+        conn = connect()
         cursor = conn.cursor()
 
         # Check if user_settings table exists
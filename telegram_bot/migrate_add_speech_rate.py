@@ -3,12 +3,10 @@
 Запускать один раз: python migrate_add_speech_rate.py
 """
 
-import sqlite3
 import sys
-from pathlib import Path
 
-# Путь к базе данных
-DB_PATH = Path(__file__).parent / "bot_history.db"
+from config import DB_PATH
+from _sqlite_util import connect
 
 
 def migrate():
@@ -18,7 +16,7 @@ def migrate():
         print("Создайте базу данных сначала, запустив бота.")
         sys.exit(1)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     cursor = conn.cursor()
 
     try:
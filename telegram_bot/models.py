@@ -3,7 +3,7 @@
 """
 
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Text, BigInteger, Boolean
+from sqlalchemy import String, Integer, DateTime, Text, BigInteger, Boolean, Index, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -34,6 +34,12 @@ class TrackedChannel(Base):
     """Модель для хранения отслеживаемых каналов."""
 
     __tablename__ = "tracked_channels"
+    __table_args__ = (
+        # Уникальность нужна для UPSERT в add_tracked_channel
+        Index("uq_tracked_channels_user_channel", "user_id", "channel_username", unique=True),
+        # Частичный индекс только по активным подпискам для get_tracked_channels
+        Index("ix_tracked_channels_active_user", "user_id", sqlite_where=text("is_active = 1")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
@@ -51,6 +57,12 @@ class TrackedChat(Base):
     """Модель для хранения отслеживаемых чатов."""
 
     __tablename__ = "tracked_chats"
+    __table_args__ = (
+        # Уникальность нужна для UPSERT в add_tracked_chat
+        Index("uq_tracked_chats_user_chat", "user_id", "chat_id", unique=True),
+        # Частичный индекс только по активным подпискам для get_tracked_chats
+        Index("ix_tracked_chats_active_user", "user_id", sqlite_where=text("is_active = 1")),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
@@ -68,6 +80,10 @@ class VoicedMessage(Base):
     """Модель для хранения озвученных сообщений."""
 
     __tablename__ = "voiced_messages"
+    __table_args__ = (
+        # Покрывающий индекс для get_last_voiced_message_ids (MAX(message_id) по источникам)
+        Index("ix_voiced_lookup", "user_id", "source_type", "source_id", "message_id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
@@ -2,19 +2,75 @@
 Сервис для работы с Telethon User API
 """
 
+import asyncio
 import logging
-from typing import List, Optional, Tuple
-from telethon import TelegramClient
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+from telethon import TelegramClient, functions, utils
 from telethon.sessions import StringSession
-from telethon.tl.types import Channel, User, Chat, Message
-from telethon.errors import SessionPasswordNeededError
+from telethon.tl.types import Channel, User, Chat, Message, InputDialogPeer
+from telethon.errors import SessionPasswordNeededError, FloodWaitError
 
 logger = logging.getLogger(__name__)
 
 
+class RateLimiter:
+    """
+    Ограничитель частоты запросов (token bucket).
+
+    Пропускает не больше rate запросов за per секунд, допуская короткие
+    всплески до rate запросов подряд. Используется как async context manager.
+    """
+
+    def __init__(self, rate: float, per: float = 1.0):
+        self.rate = rate
+        self.per = per
+        self._tokens = rate
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ждет, пока в корзине появится токен, и забирает его."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated_at) * self.rate / self.per)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
 class TelethonService:
     """Сервис для работы с Telegram User API через Telethon."""
 
+    # Кэш разрешения username/ID -> информация о канале/чате (LRU с TTL):
+    # повторные добавления не тратят resolve-запросы из лимитов Telegram
+    INFO_CACHE_TTL = 3600.0
+    INFO_CACHE_SIZE = 1024
+
+    # Самоограничение запросов к Telegram, чтобы не доводить до FloodWait
+    REQUESTS_PER_SECOND = 20
+    # FloodWait до 60 с Telethon пережидает сам (flood_sleep_threshold);
+    # более долгое ожидание пережидаем один раз, если оно не больше этого предела
+    FLOOD_WAIT_MAX_SLEEP = 300
+
+    # Сколько источников запрашивается одним GetPeerDialogs
+    TOP_MESSAGE_BATCH_SIZE = 100
+    # Максимум сообщений в одном запросе истории (ограничение Telegram)
+    HISTORY_PAGE_SIZE = 100
+
     def __init__(self, session_string: str, api_id: int, api_hash: str, phone: str):
         """
         Инициализация клиента Telethon.
@@ -30,6 +86,49 @@ class TelethonService:
         self.api_hash = api_hash
         self.session_string = session_string
         self.client: Optional[TelegramClient] = None
+        # {(тип, нормализованный идентификатор): (время истечения, результат)}
+        self._info_cache: OrderedDict = OrderedDict()
+        self._limiter = RateLimiter(self.REQUESTS_PER_SECOND)
+
+    async def _request(self, func, *args, **kwargs):
+        """
+        Выполняет запрос к Telegram через ограничитель частоты.
+
+        При FloodWait не длиннее FLOOD_WAIT_MAX_SLEEP ждет указанное время
+        и повторяет запрос один раз, иначе пробрасывает ошибку.
+        """
+        async with self._limiter:
+            try:
+                return await func(*args, **kwargs)
+            except FloodWaitError as e:
+                if e.seconds > self.FLOOD_WAIT_MAX_SLEEP:
+                    raise
+                wait_seconds = e.seconds
+
+        logger.warning("FloodWait: ожидание %s с перед повтором запроса", wait_seconds)
+        await asyncio.sleep(wait_seconds)
+
+        async with self._limiter:
+            return await func(*args, **kwargs)
+
+    def _info_cache_get(self, key: tuple):
+        """Возвращает закэшированную информацию или None, если записи нет или она устарела."""
+        entry = self._info_cache.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if time.monotonic() > expires:
+            del self._info_cache[key]
+            return None
+        self._info_cache.move_to_end(key)
+        return value
+
+    def _info_cache_put(self, key: tuple, value):
+        """Сохраняет информацию в кэш, вытесняя самую давно использованную запись."""
+        self._info_cache[key] = (time.monotonic() + self.INFO_CACHE_TTL, value)
+        self._info_cache.move_to_end(key)
+        if len(self._info_cache) > self.INFO_CACHE_SIZE:
+            self._info_cache.popitem(last=False)
 
     async def start(self):
         """Запускает клиент Telethon."""
@@ -53,7 +152,7 @@ class TelethonService:
             logger.info("Telethon клиент успешно запущен")
 
         except Exception as e:
-            logger.error(f"Ошибка при запуске Telethon клиента: {e}")
+            logger.error("Ошибка при запуске Telethon клиента: %s", e)
             raise
 
     async def stop(self):
@@ -72,23 +171,29 @@ class TelethonService:
         Returns:
             Tuple[channel_id, channel_title] или None если не найден
         """
-        try:
-            # Убираем @ если есть
-            username = username.lstrip('@')
+        # Убираем @ если есть
+        username = username.lstrip('@')
+        cache_key = ('channel', username.lower())
+        cached = self._info_cache_get(cache_key)
+        if cached is not None:
+            return cached
 
-            entity = await self.client.get_entity(username)
+        try:
+            entity = await self._request(self.client.get_entity, username)
 
             if isinstance(entity, Channel):
-                return (entity.id, entity.title)
+                info = (entity.id, entity.title)
+                self._info_cache_put(cache_key, info)
+                return info
             else:
-                logger.warning(f"Entity {username} не является каналом")
+                logger.warning("Entity %s не является каналом", username)
                 return None
 
         except Exception as e:
-            logger.error(f"Ошибка при получении информации о канале {username}: {e}")
+            logger.error("Ошибка при получении информации о канале %s: %s", username, e)
             return None
 
-    async def get_chat_info(self, identifier: str) -> Optional[Tuple[int, str, Optional[str]]]:
+    async def get_chat_info(self, identifier: Union[str, int]) -> Optional[Tuple[int, str, Optional[str]]]:
         """
         Получает информацию о чате по username или ID.
 
@@ -99,36 +204,45 @@ class TelethonService:
             Tuple[chat_id, chat_title, username] или None если не найден
         """
         try:
+            cache_key = ('chat', str(identifier).lstrip('@').lower())
+            cached = self._info_cache_get(cache_key)
+            if cached is not None:
+                return cached
+
             # Пробуем преобразовать в int (если это ID)
             try:
                 chat_id = int(identifier)
-                entity = await self.client.get_entity(chat_id)
+                entity = await self._request(self.client.get_entity, chat_id)
             except ValueError:
                 # Это username
-                username = identifier.lstrip('@')
-                entity = await self.client.get_entity(username)
+                username = str(identifier).lstrip('@')
+                entity = await self._request(self.client.get_entity, username)
 
             # Получаем информацию в зависимости от типа
             if isinstance(entity, User):
                 username = entity.username if hasattr(entity, 'username') else None
                 title = f"{entity.first_name or ''} {entity.last_name or ''}".strip()
-                return (entity.id, title, username)
+                info = (entity.id, title, username)
             elif isinstance(entity, (Chat, Channel)):
                 username = entity.username if hasattr(entity, 'username') else None
-                return (entity.id, entity.title, username)
+                info = (entity.id, entity.title, username)
             else:
-                logger.warning(f"Неизвестный тип entity: {type(entity)}")
+                logger.warning("Неизвестный тип entity: %s", type(entity))
                 return None
 
+            self._info_cache_put(cache_key, info)
+            return info
+
         except Exception as e:
-            logger.error(f"Ошибка при получении информации о чате {identifier}: {e}")
+            logger.error("Ошибка при получении информации о чате %s: %s", identifier, e)
             return None
 
     async def get_channel_messages(
         self,
         channel_username: str,
         limit: int = 10,
-        min_id: int = 0
+        min_id: int = 0,
+        raise_errors: bool = False
     ) -> List[Tuple[int, str]]:
         """
         Получает последние сообщения из канала.
@@ -137,46 +251,31 @@ class TelethonService:
             channel_username: Username канала
             limit: Максимальное количество сообщений
             min_id: ID сообщения, с которого начинать (не включая его)
+            raise_errors: Пробрасывать ошибки чтения вместо пустого списка,
+                чтобы вызывающий код мог отличить сбой от источника без сообщений
 
         Returns:
             List[Tuple[message_id, message_text]]
         """
         try:
             username = channel_username.lstrip('@')
-            entity = await self.client.get_entity(username)
-
-            messages = []
-            # Запрашиваем больше сообщений, чтобы учесть посты без текста (только изображения и т.д.)
-            # Увеличиваем лимит в 5 раз, но не более 100
-            fetch_limit = min(limit * 5, 100)
-
-            async for message in self.client.iter_messages(
-                entity,
-                limit=fetch_limit,
-                reverse=False,  # От новых к старым
-                min_id=min_id
-            ):
-                # Извлекаем текст из сообщения (даже если есть медиа)
-                text = self._extract_message_text(message)
-                if text:
-                    messages.append((message.id, text))
-                    # Останавливаемся когда набрали нужное количество сообщений с текстом
-                    if len(messages) >= limit:
-                        break
-
-            # Разворачиваем чтобы от старых к новым
-            messages.reverse()
-            return messages
+            # get_input_entity берет peer из кэша сессии: в отличие от get_entity,
+            # повторные чтения канала не тратят ResolveUsername на каждый вызов
+            entity = await self._request(self.client.get_input_entity, username)
+            return await self._collect_messages(entity, limit, min_id)
 
         except Exception as e:
-            logger.error(f"Ошибка при получении сообщений из канала {channel_username}: {e}")
+            if raise_errors:
+                raise
+            logger.error("Ошибка при получении сообщений из канала %s: %s", channel_username, e)
             return []
 
     async def get_chat_messages(
         self,
         chat_id: int,
         limit: int = 10,
-        min_id: int = 0
+        min_id: int = 0,
+        raise_errors: bool = False
     ) -> List[Tuple[int, str]]:
         """
         Получает последние сообщения из чата.
@@ -185,24 +284,108 @@ class TelethonService:
             chat_id: ID чата
             limit: Максимальное количество сообщений
             min_id: ID сообщения, с которого начинать (не включая его)
+            raise_errors: Пробрасывать ошибки чтения вместо пустого списка,
+                чтобы вызывающий код мог отличить сбой от источника без сообщений
 
         Returns:
             List[Tuple[message_id, message_text]]
         """
         try:
-            entity = await self.client.get_entity(chat_id)
-
-            messages = []
-            # Запрашиваем больше сообщений, чтобы учесть сообщения без текста (только изображения и т.д.)
-            # Увеличиваем лимит в 5 раз, но не более 100
-            fetch_limit = min(limit * 5, 100)
-
-            async for message in self.client.iter_messages(
-                entity,
-                limit=fetch_limit,
-                reverse=False,
-                min_id=min_id
-            ):
+            # Для чтения сообщений достаточно InputPeer из кэша сессии, без запроса полной entity
+            entity = await self._request(self.client.get_input_entity, chat_id)
+            return await self._collect_messages(entity, limit, min_id)
+
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error("Ошибка при получении сообщений из чата %s: %s", chat_id, e)
+            return []
+
+    async def get_top_message_ids(self, refs: list) -> Dict[object, int]:
+        """
+        Возвращает ID последних сообщений нескольких каналов и чатов.
+
+        Запрашивает диалоги аккаунта пачками по TOP_MESSAGE_BATCH_SIZE источников
+        (GetPeerDialogs), а не историю каждого источника отдельно. Источники,
+        которых нет среди диалогов аккаунта, в результат не попадают: для них
+        наличие новых сообщений неизвестно.
+
+        Args:
+            refs: Username каналов и ID чатов, как для get_channel_messages/get_chat_messages
+
+        Returns:
+            Словарь {ref: ID последнего сообщения}
+        """
+        async def resolve(ref):
+            try:
+                return await self._request(
+                    self.client.get_input_entity, ref.lstrip('@') if isinstance(ref, str) else ref
+                )
+            except Exception as e:
+                logger.debug("Не удалось получить peer источника %s: %s", ref, e)
+                return None
+
+        # Peer'ы разрешаются параллельно (частоту ограничивает _request):
+        # обычно они берутся из кэша сессии, а для новых источников
+        # ResolveUsername не выполняются друг за другом
+        entities = await asyncio.gather(*(resolve(ref) for ref in refs))
+
+        peer_refs = {}
+        for ref, entity in zip(refs, entities):
+            if entity is not None:
+                peer_refs.setdefault(utils.get_peer_id(entity), []).append((ref, entity))
+
+        peers = [entries[0][1] for entries in peer_refs.values()]
+        top_ids = {}
+        for start in range(0, len(peers), self.TOP_MESSAGE_BATCH_SIZE):
+            batch = peers[start:start + self.TOP_MESSAGE_BATCH_SIZE]
+            try:
+                result = await self._request(
+                    self.client,
+                    functions.messages.GetPeerDialogsRequest(
+                        peers=[InputDialogPeer(peer) for peer in batch]
+                    )
+                )
+            except Exception as e:
+                # Без этих данных источники просто читаются целиком, как раньше
+                logger.warning("Не удалось получить последние сообщения диалогов: %s", e)
+                continue
+
+            for dialog in result.dialogs:
+                for ref, _ in peer_refs.get(utils.get_peer_id(dialog.peer), ()):
+                    top_ids[ref] = dialog.top_message
+
+        return top_ids
+
+    async def _collect_messages(self, entity, limit: int, min_id: int) -> List[Tuple[int, str]]:
+        """
+        Читает последние сообщения с текстом из канала или чата.
+
+        История читается страницами, каждая страница - отдельный запрос через
+        _request: ограничитель частоты учитывает каждую страницу, а FloodWait
+        повторяет только текущую страницу, не начиная сбор заново.
+
+        Returns:
+            List[Tuple[message_id, message_text]] от старых к новым
+        """
+        messages = []
+        # Запрашиваем больше сообщений, чтобы учесть посты без текста (только изображения и т.д.)
+        # Увеличиваем лимит в 5 раз, но не более 100
+        fetch_limit = min(limit * 5, 100)
+        fetched = 0
+        max_id = 0  # Верхняя граница страницы (0 - без границы, с самых новых)
+
+        while fetched < fetch_limit and len(messages) < limit:
+            page_size = min(fetch_limit - fetched, self.HISTORY_PAGE_SIZE)
+            page = await self._request(
+                self.client.get_messages, entity, limit=page_size, min_id=min_id, max_id=max_id
+            )
+            if not page:
+                break
+            fetched += len(page)
+
+            # Страница идет от новых к старым
+            for message in page:
                 # Извлекаем текст из сообщения (даже если есть медиа)
                 text = self._extract_message_text(message)
                 if text:
@@ -211,13 +394,13 @@ class TelethonService:
                     if len(messages) >= limit:
                         break
 
-            # Разворачиваем чтобы от старых к новым
-            messages.reverse()
-            return messages
+            if len(page) < page_size:
+                break  # История до min_id закончилась
+            max_id = page[-1].id
 
-        except Exception as e:
-            logger.error(f"Ошибка при получении сообщений из чата {chat_id}: {e}")
-            return []
+        # Разворачиваем чтобы от старых к новым
+        messages.reverse()
+        return messages
 
     def _extract_message_text(self, message: Message) -> Optional[str]:
         """
@@ -258,10 +441,10 @@ class TelethonService:
         """
         try:
             # Получаем entity канала
-            channel = await self.client.get_entity(channel_id)
+            channel = await self._request(self.client.get_entity, channel_id)
 
             # Получаем права пользователя в канале
-            participant = await self.client.get_permissions(channel, user_id)
+            participant = await self._request(self.client.get_permissions, channel, user_id)
 
             # Проверяем, что пользователь не забанен и является участником
             if participant and not participant.is_banned:
@@ -270,7 +453,7 @@ class TelethonService:
             return False
 
         except Exception as e:
-            logger.error(f"Ошибка при проверке подписки пользователя {user_id} на канал {channel_id}: {e}")
+            logger.error("Ошибка при проверке подписки пользователя %s на канал %s: %s", user_id, channel_id, e)
             # В случае ошибки считаем, что пользователь не подписан
             return False
 
@@ -288,11 +471,11 @@ class TelethonService:
             # Пробуем преобразовать в int (если это ID)
             try:
                 user_id = int(identifier)
-                entity = await self.client.get_entity(user_id)
+                entity = await self._request(self.client.get_entity, user_id)
             except ValueError:
                 # Это username
-                username = identifier.lstrip('@')
-                entity = await self.client.get_entity(username)
+                username = str(identifier).lstrip('@')
+                entity = await self._request(self.client.get_entity, username)
 
             # Проверяем, что это пользователь
             if isinstance(entity, User):
@@ -301,17 +484,21 @@ class TelethonService:
                 last_name = entity.last_name if hasattr(entity, 'last_name') else None
                 return (entity.id, username, first_name, last_name)
             else:
-                logger.warning(f"Entity {identifier} не является пользователем, а {type(entity)}")
+                logger.warning("Entity %s не является пользователем, а %s", identifier, type(entity))
                 return None
 
         except Exception as e:
-            logger.error(f"Ошибка при получении информации о пользователе {identifier}: {e}")
+            logger.error("Ошибка при получении информации о пользователе %s: %s", identifier, e)
             return None
 
 
 # Глобальный экземпляр сервиса
 _telethon_service: Optional[TelethonService] = None
 
+# Сериализует переподключение: одновременные обработчики не должны
+# запускать несколько connect() для одного клиента
+_reconnect_lock = asyncio.Lock()
+
 
 async def get_telethon_service() -> TelethonService:
     """Возвращает глобальный экземпляр TelethonService."""
@@ -320,6 +507,17 @@ async def get_telethon_service() -> TelethonService:
     if _telethon_service is None:
         raise RuntimeError("TelethonService не инициализирован. Вызовите init_telethon_service() сначала.")
 
+    # Переподключаем тот же клиент (ключи авторизации уже в сессии),
+    # вместо создания нового клиента с полным handshake
+    # Быстрый путь без блокировки: подключенный клиент отдается сразу
+    client = _telethon_service.client
+    if client is not None and not client.is_connected():
+        async with _reconnect_lock:
+            # Клиент мог переподключить другой обработчик, пока мы ждали блокировку
+            if not client.is_connected():
+                logger.info("Telethon клиент отключен, переподключаюсь")
+                await client.connect()
+
     return _telethon_service
 
 
@@ -335,6 +533,11 @@ async def init_telethon_service(session_string: str, api_id: int, api_hash: str,
     """
     global _telethon_service
 
+    if _telethon_service is not None:
+        # Клиент уже создан - повторная инициализация не должна плодить соединения
+        logger.info("TelethonService уже инициализирован, используется существующий клиент")
+        return
+
     _telethon_service = TelethonService(session_string, api_id, api_hash, phone)
     await _telethon_service.start()
     logger.info("TelethonService инициализирован")
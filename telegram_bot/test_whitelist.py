@@ -3,11 +3,6 @@
 """
 
 import asyncio
-import sys
-from pathlib import Path
-
-# Добавляем путь к tts_common
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from database import (
     init_db,
@@ -1,42 +1,62 @@
 """
 Document Parser - извлечение текста из различных форматов документов
 Поддерживает: txt, docx, pdf, md, rtf, epub, fb2
+
+Парсеры принимают путь к файлу или открытый бинарный поток (например, BytesIO),
+поэтому документ можно разобрать прямо из памяти без временного файла.
 """
 
+import io
 import os
-from typing import Optional
+import tempfile
+from typing import BinaryIO, Optional, Union
 import mimetypes
 
+# Путь к файлу или бинарный поток с содержимым документа
+DocumentSource = Union[str, BinaryIO]
+
+
+def _read_bytes(source: DocumentSource) -> bytes:
+    """Читает содержимое документа из файла или потока."""
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read()
+    return source.read()
+
+
+def _decode(data: bytes, encoding: str, errors: str = 'strict') -> str:
+    """Декодирует текст и приводит переводы строк к \\n, как open() в текстовом режиме."""
+    return data.decode(encoding, errors).replace('\r\n', '\n').replace('\r', '\n')
+
 
-def parse_txt(file_path: str) -> str:
+def parse_txt(source: DocumentSource) -> str:
     """Извлекает текст из TXT файла."""
+    data = _read_bytes(source)
     encodings = ['utf-8', 'cp1251', 'latin-1']
 
     for encoding in encodings:
         try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                return f.read()
+            return _decode(data, encoding)
         except (UnicodeDecodeError, UnicodeError):
             continue
 
     # Если все кодировки не подошли, читаем с игнорированием ошибок
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        return f.read()
+    return _decode(data, 'utf-8', errors='ignore')
 
 
-def parse_docx(file_path: str) -> str:
+def parse_docx(source: DocumentSource) -> str:
     """Извлекает текст из DOCX файла."""
     try:
         from docx import Document
     except ImportError:
         raise ImportError("Для работы с DOCX файлами установите: pip install python-docx")
 
-    doc = Document(file_path)
+    doc = Document(source)
     paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
     return '\n\n'.join(paragraphs)
 
 
-def parse_pdf(file_path: str) -> str:
+def parse_pdf(source: DocumentSource) -> str:
     """Извлекает текст из PDF файла."""
     try:
         import pdfplumber
@@ -44,7 +64,7 @@ def parse_pdf(file_path: str) -> str:
         raise ImportError("Для работы с PDF файлами установите: pip install pdfplumber")
 
     text_parts = []
-    with pdfplumber.open(file_path) as pdf:
+    with pdfplumber.open(source) as pdf:
         for page in pdf.pages:
             text = page.extract_text()
             if text:
@@ -53,25 +73,24 @@ def parse_pdf(file_path: str) -> str:
     return '\n\n'.join(text_parts)
 
 
-def parse_markdown(file_path: str) -> str:
+def parse_markdown(source: DocumentSource) -> str:
     """Извлекает текст из Markdown файла (просто читает как текст)."""
-    return parse_txt(file_path)
+    return parse_txt(source)
 
 
-def parse_rtf(file_path: str) -> str:
+def parse_rtf(source: DocumentSource) -> str:
     """Извлекает текст из RTF файла."""
     try:
         from striprtf.striprtf import rtf_to_text
     except ImportError:
         raise ImportError("Для работы с RTF файлами установите: pip install striprtf")
 
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        rtf_content = f.read()
+    rtf_content = _decode(_read_bytes(source), 'utf-8', errors='ignore')
 
     return rtf_to_text(rtf_content)
 
 
-def parse_epub(file_path: str) -> str:
+def parse_epub(source: DocumentSource) -> str:
     """Извлекает текст из EPUB файла."""
     try:
         import ebooklib
@@ -80,7 +99,14 @@ def parse_epub(file_path: str) -> str:
     except ImportError:
         raise ImportError("Для работы с EPUB файлами установите: pip install EbookLib beautifulsoup4")
 
-    book = epub.read_epub(file_path)
+    if isinstance(source, str):
+        book = epub.read_epub(source)
+    else:
+        # EbookLib открывает книгу только по пути - поток сохраняем во временный файл
+        with tempfile.NamedTemporaryFile(suffix='.epub') as tmp:
+            tmp.write(source.read())
+            tmp.flush()
+            book = epub.read_epub(tmp.name)
     chapters = []
 
     for item in book.get_items():
@@ -93,15 +119,14 @@ def parse_epub(file_path: str) -> str:
     return '\n\n'.join(chapters)
 
 
-def parse_fb2(file_path: str) -> str:
+def parse_fb2(source: DocumentSource) -> str:
     """Извлекает текст из FB2 файла."""
     try:
         from bs4 import BeautifulSoup
     except ImportError:
         raise ImportError("Для работы с FB2 файлами установите: pip install beautifulsoup4 lxml")
 
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
+    content = _decode(_read_bytes(source), 'utf-8', errors='ignore')
 
     soup = BeautifulSoup(content, 'lxml-xml')
 
@@ -153,6 +178,35 @@ def detect_file_type(file_path: str) -> Optional[str]:
     return None
 
 
+# Парсеры по типу файла
+PARSERS = {
+    'txt': parse_txt,
+    'docx': parse_docx,
+    'pdf': parse_pdf,
+    'md': parse_markdown,
+    'rtf': parse_rtf,
+    'epub': parse_epub,
+    'fb2': parse_fb2,
+}
+
+
+def _parse_source(source: DocumentSource, file_type: str, name: str) -> str:
+    """Извлекает текст парсером для file_type; name используется в сообщениях об ошибках."""
+    parser = PARSERS.get(file_type)
+    if parser is None:
+        raise ValueError(f"Формат '{file_type}' не поддерживается")
+
+    try:
+        text = parser(source)
+        if not text or not text.strip():
+            raise ValueError(f"Файл '{name}' не содержит текста или текст не удалось извлечь")
+        return text
+    except ImportError as e:
+        raise ImportError(f"Отсутствует необходимая библиотека: {e}")
+    except Exception as e:
+        raise ValueError(f"Ошибка при парсинге файла '{name}': {e}")
+
+
 def parse_document(file_path: str, file_type: Optional[str] = None) -> str:
     """
     Универсальная функция для извлечения текста из документа.
@@ -178,32 +232,37 @@ def parse_document(file_path: str, file_type: Optional[str] = None) -> str:
     if file_type is None:
         raise ValueError(f"Не удалось определить тип файла: {file_path}")
 
-    # Парсинг в зависимости от типа
-    parsers = {
-        'txt': parse_txt,
-        'docx': parse_docx,
-        'pdf': parse_pdf,
-        'md': parse_markdown,
-        'rtf': parse_rtf,
-        'epub': parse_epub,
-        'fb2': parse_fb2,
-    }
+    return _parse_source(file_path, file_type, file_path)
 
-    parser = parsers.get(file_type)
-    if parser is None:
-        raise ValueError(f"Формат '{file_type}' не поддерживается")
 
-    try:
-        text = parser(file_path)
-        if not text or not text.strip():
-            raise ValueError(f"Файл '{file_path}' не содержит текста или текст не удалось извлечь")
-        return text
-    except ImportError as e:
-        raise ImportError(f"Отсутствует необходимая библиотека: {e}")
-    except Exception as e:
-        raise ValueError(f"Ошибка при парсинге файла '{file_path}': {e}")
+def parse_document_bytes(data: bytes, file_name: str, file_type: Optional[str] = None) -> str:
+    """
+    Извлекает текст из документа, уже загруженного в память.
+
+    Args:
+        data: Содержимое файла
+        file_name: Имя файла (для определения типа по расширению и сообщений об ошибках)
+        file_type: Тип файла (опционально, определится по file_name)
+
+    Returns:
+        Извлеченный текст
+
+    Raises:
+        ValueError: Если формат файла не поддерживается
+    """
+    if file_type is None:
+        file_type = detect_file_type(file_name)
+
+    if file_type is None:
+        raise ValueError(f"Не удалось определить тип файла: {file_name}")
+
+    return _parse_source(io.BytesIO(data), file_type, file_name)
 
 
 # Список поддерживаемых форматов
 SUPPORTED_FORMATS = ['txt', 'docx', 'pdf', 'md', 'markdown', 'rtf', 'epub', 'fb2']
 SUPPORTED_EXTENSIONS = ['.txt', '.docx', '.pdf', '.md', '.markdown', '.rtf', '.epub', '.fb2']
+
+# Для проверки расширения за O(1) и для сообщений пользователю - вычисляются один раз
+SUPPORTED_EXTENSIONS_SET = frozenset(ext.lower() for ext in SUPPORTED_EXTENSIONS)
+SUPPORTED_EXTENSIONS_TEXT = ', '.join(SUPPORTED_EXTENSIONS)
@@ -5,8 +5,10 @@ Storage Manager - управление хранилищем аудиофайло
 
 import os
 import asyncio
+import threading
+import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 
@@ -16,6 +18,9 @@ class StorageManager:
     Автоматически очищает старые файлы при превышении лимита.
     """
 
+    # Как долго закэшированный размер хранилища считается актуальным (секунды)
+    SIZE_CACHE_TTL = 60.0
+
     def __init__(self, storage_dir: str, max_size_mb: int = 500):
         """
         Args:
@@ -26,6 +31,110 @@ class StorageManager:
         self.max_size_bytes = max_size_mb * 1024 * 1024  # Конвертируем MB в байты
         self.storage_dir.mkdir(parents=True, exist_ok=True)
 
+        # Закэшированный размер хранилища: обновляется через add_file/remove_file,
+        # успешная проверка ensure_space_available сразу прибавляет к нему
+        # запрошенное место (резерв под файл, который еще будет записан).
+        # Пересчитывается полным сканированием не чаще раза в SIZE_CACHE_TTL секунд
+        # или когда резервы не помещаются в лимит: файлы синтеза создаются в обход
+        # менеджера, и сканирование сводит резервы с реальным размером
+        self._total_size: Optional[int] = None
+        self._size_checked_at = 0.0
+        # Методы вызываются и из event loop, и из пула потоков
+        self._lock = threading.Lock()
+        # Сканирование и очистка выполняются одним потоком за раз
+        self._scan_lock = threading.Lock()
+        # Закрепленные файлы (например, аудио из кэша во время отправки): {путь: счетчик}.
+        # Очистка их не удаляет
+        self._pinned: Dict[str, int] = {}
+
+    def _refresh_size(self) -> int:
+        """Пересчитывает размер хранилища сканированием директории и обновляет кэш."""
+        size = self.get_directory_size()
+        with self._lock:
+            self._total_size = size
+            self._size_checked_at = time.monotonic()
+        return size
+
+    def _try_reserve(self, required_space: int) -> bool:
+        """
+        Резервирует место по свежему кэшу размера, если оно заведомо есть.
+
+        Резерв прибавляется к кэшу под блокировкой, поэтому одновременные
+        запросы не проходят проверку по одному и тому же значению.
+        """
+        with self._lock:
+            if self._total_size is None:
+                return False
+            if time.monotonic() - self._size_checked_at > self.SIZE_CACHE_TTL:
+                return False
+            if self._total_size + required_space > self.max_size_bytes:
+                return False
+            self._total_size += required_space
+            return True
+
+    def add_file(self, file_path: str):
+        """Учитывает в кэше размера новый файл, записанный в хранилище."""
+        try:
+            file_size = os.path.getsize(file_path)
+        except OSError:
+            return
+        with self._lock:
+            if self._total_size is not None:
+                self._total_size += file_size
+
+    def pin_file(self, file_path: str):
+        """Закрепляет файл: пока он закреплен, очистка его не удаляет."""
+        with self._lock:
+            self._pinned[file_path] = self._pinned.get(file_path, 0) + 1
+
+    def unpin_file(self, file_path: str):
+        """Снимает одно закрепление файла (парный вызов к pin_file)."""
+        with self._lock:
+            count = self._pinned.get(file_path, 0) - 1
+            if count > 0:
+                self._pinned[file_path] = count
+            else:
+                self._pinned.pop(file_path, None)
+
+    def remove_file(self, file_path: str) -> bool:
+        """
+        Удаляет файл из хранилища и вычитает его размер из кэша.
+
+        Закрепленные файлы не удаляются. Проверка и удаление выполняются под
+        блокировкой, поэтому файл не может быть закреплен между ними.
+
+        Returns:
+            True если файл был удален
+        """
+        with self._lock:
+            if file_path in self._pinned:
+                return False
+            try:
+                file_size = os.path.getsize(file_path)
+                os.remove(file_path)
+            except OSError:
+                return False
+
+            if self._total_size is not None:
+                self._total_size = max(0, self._total_size - file_size)
+        return True
+
+    def touch_file(self, file_path: str) -> bool:
+        """
+        Обновляет время модификации файла при повторном использовании.
+
+        Очистка удаляет файлы по mtime, поэтому часто используемые файлы
+        (например, закэшированное аудио) вытесняются последними (LRU).
+
+        Returns:
+            True если файл существует и время обновлено
+        """
+        try:
+            os.utime(file_path)
+        except OSError:
+            return False
+        return True
+
     def get_directory_size(self) -> int:
         """
         Вычисляет общий размер всех файлов в директории.
@@ -73,7 +182,7 @@ class StorageManager:
         Returns:
             Количество удаленных файлов
         """
-        current_size = self.get_directory_size()
+        current_size = self._refresh_size()
         target_size = self.max_size_bytes - required_space
 
         if current_size <= target_size:
@@ -93,16 +202,17 @@ class StorageManager:
 
             try:
                 file_size = file_path.stat().st_size
-                file_path.unlink()
-                freed_space += file_size
-                deleted_count += 1
-
-                mod_time = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
-                print(f"[StorageManager] Удален: {file_path.name} ({file_size / 1024:.2f} KB, {mod_time})")
-
-            except OSError as e:
-                print(f"[StorageManager] Не удалось удалить {file_path.name}: {e}")
+            except OSError:
                 continue
+            # remove_file сразу вычитает размер из кэша
+            if not self.remove_file(str(file_path)):
+                print(f"[StorageManager] Пропущен (используется или недоступен): {file_path.name}")
+                continue
+
+            freed_space += file_size
+            deleted_count += 1
+            mod_time = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"[StorageManager] Удален: {file_path.name} ({file_size / 1024:.2f} KB, {mod_time})")
 
         print(f"[StorageManager] Удалено файлов: {deleted_count}, освобождено: {freed_space / 1024 / 1024:.2f} MB")
         return deleted_count
@@ -124,22 +234,31 @@ class StorageManager:
         Returns:
             True если места достаточно или оно было освобождено
         """
-        current_size = self.get_directory_size()
+        # Быстрый путь: по свежему кэшу места заведомо хватает - без сканирования
+        if self._try_reserve(required_space):
+            return True
 
-        if current_size + required_space <= self.max_size_bytes:
-            return True  # Места достаточно
+        with self._scan_lock:
+            # Пока ждали, другой поток мог уже пересчитать размер
+            if self._try_reserve(required_space):
+                return True
 
-        # Пытаемся освободить место
-        self.cleanup_old_files(required_space)
+            self._refresh_size()
+            if self._try_reserve(required_space):
+                return True  # Места достаточно
 
-        # Проверяем результат
-        new_size = self.get_directory_size()
-        return new_size + required_space <= self.max_size_bytes
+            # Пытаемся освободить место (cleanup_old_files обновляет кэш размера)
+            self.cleanup_old_files(required_space)
+
+            return self._try_reserve(required_space)
 
     async def ensure_space_available_async(self, required_space: int) -> bool:
         """
         Асинхронная версия ensure_space_available.
         """
+        if self._try_reserve(required_space):
+            return True  # O(1) проверка без перехода в пул потоков
+
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(None, self.ensure_space_available, required_space)
 
@@ -150,7 +269,7 @@ class StorageManager:
         Returns:
             Словарь со статистикой
         """
-        current_size = self.get_directory_size()
+        current_size = self._refresh_size()
         files = list(self.storage_dir.rglob('*'))
         file_count = sum(1 for f in files if f.is_file())
 
@@ -161,3 +280,10 @@ class StorageManager:
             'file_count': file_count,
             'available_mb': (self.max_size_bytes - current_size) / 1024 / 1024
         }
+
+    async def get_storage_stats_async(self) -> dict:
+        """
+        Асинхронная версия get_storage_stats.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self.get_storage_stats)
@@ -6,6 +6,28 @@ import re
 import secrets
 from typing import List
 
+# Регулярные выражения компилируются один раз при импорте модуля
+MD_HEADER_RE = re.compile(r'^#{1,6}\s+', re.MULTILINE)
+MD_CODE_BLOCK_RE = re.compile(r'```[\s\S]*?```')
+MD_INLINE_CODE_RE = re.compile(r'`([^`]+)`')
+MD_LINK_RE = re.compile(r'\[([^\]]+)\]\([^\)]+\)')
+MD_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^\)]+\)')
+MD_QUOTE_RE = re.compile(r'^>\s+', re.MULTILINE)
+MD_BOLD_STAR_RE = re.compile(r'\*\*([^\*]+)\*\*')
+MD_BOLD_UNDERSCORE_RE = re.compile(r'__([^_]+)__')
+MD_ITALIC_STAR_RE = re.compile(r'\*([^\*]+)\*')
+MD_ITALIC_UNDERSCORE_RE = re.compile(r'_([^_]+)_')
+SCENE_SEPARATOR_RE = re.compile(r'^\s*[-*_]{3,}\s*$', re.MULTILINE)
+DIALOGUE_DASH_RE = re.compile(r'^\s*—\s*', re.MULTILINE)
+BULLET_LIST_RE = re.compile(r'^\s*[-*+]\s+', re.MULTILINE)
+NUMBERED_LIST_RE = re.compile(r'^\s*\d+\.\s+', re.MULTILINE)
+MULTI_SPACE_RE = re.compile(r'[ \t]+')
+MULTI_NEWLINE_RE = re.compile(r'\n\s*\n\s*\n+')
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+FILENAME_INVALID_CHARS_RE = re.compile(r'[<>:"/\\|?*\x00-\x1F]')
+WHITESPACE_RE = re.compile(r'\s+')
+MULTI_UNDERSCORE_RE = re.compile(r'__+')
+
 
 def clean_text_for_tts(text: str) -> str:
     """
@@ -28,30 +50,30 @@ def clean_text_for_tts(text: str) -> str:
     text = '\n'.join(lines)
 
     # 2. Удаляем markdown заголовки (# ## ### и т.д.)
-    text = re.sub(r'^#{1,6}\s+', '', text, flags=re.MULTILINE)
+    text = MD_HEADER_RE.sub('', text)
 
     # 3. Удаляем блоки кода (``` код ```)
-    text = re.sub(r'```[\s\S]*?```', '', text)
+    text = MD_CODE_BLOCK_RE.sub('', text)
 
     # 4. Удаляем inline код (`код`)
-    text = re.sub(r'`([^`]+)`', r'\1', text)
+    text = MD_INLINE_CODE_RE.sub(r'\1', text)
 
     # 5. Удаляем ссылки markdown [текст](url) - оставляем только текст
-    text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
+    text = MD_LINK_RE.sub(r'\1', text)
 
     # 6. Удаляем изображения ![alt](url)
-    text = re.sub(r'!\[([^\]]*)\]\([^\)]+\)', '', text)
+    text = MD_IMAGE_RE.sub('', text)
 
     # 7. Удаляем цитаты (> текст)
-    text = re.sub(r'^>\s+', '', text, flags=re.MULTILINE)
+    text = MD_QUOTE_RE.sub('', text)
 
     # 8. Удаляем выделение жирным (**текст** или __текст__)
-    text = re.sub(r'\*\*([^\*]+)\*\*', r'\1', text)
-    text = re.sub(r'__([^_]+)__', r'\1', text)
+    text = MD_BOLD_STAR_RE.sub(r'\1', text)
+    text = MD_BOLD_UNDERSCORE_RE.sub(r'\1', text)
 
     # 9. Удаляем выделение курсивом (*текст* или _текст_)
-    text = re.sub(r'\*([^\*]+)\*', r'\1', text)
-    text = re.sub(r'_([^_]+)_', r'\1', text)
+    text = MD_ITALIC_STAR_RE.sub(r'\1', text)
+    text = MD_ITALIC_UNDERSCORE_RE.sub(r'\1', text)
 
     # 10. Удаляем markdown таблицы (строки содержащие |)
     lines = text.split('\n')
@@ -63,14 +85,14 @@ def clean_text_for_tts(text: str) -> str:
     text = '\n'.join(cleaned_lines)
 
     # 11. Удаляем строки, содержащие только разделители сцен (***, ---)
-    text = re.sub(r'^\s*[-*_]{3,}\s*$', '', text, flags=re.MULTILINE)
+    text = SCENE_SEPARATOR_RE.sub('', text)
 
     # 12. Удаляем тире в начале строк (маркеры диалогов)
-    text = re.sub(r'^\s*—\s*', '', text, flags=re.MULTILINE)
+    text = DIALOGUE_DASH_RE.sub('', text)
 
     # 13. Удаляем списки (- пункт, * пункт, 1. пункт)
-    text = re.sub(r'^\s*[-*+]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
+    text = BULLET_LIST_RE.sub('', text)
+    text = NUMBERED_LIST_RE.sub('', text)
 
     # 14. Заменяем типографские символы на стандартные
     text = text.replace('«', '"')
@@ -86,8 +108,8 @@ def clean_text_for_tts(text: str) -> str:
     text = text.replace('#', '')
 
     # 17. Убираем лишние пробелы и переносы строк
-    text = re.sub(r'[ \t]+', ' ', text)  # Множественные пробелы в один
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)  # Множественные переносы в двойной
+    text = MULTI_SPACE_RE.sub(' ', text)  # Множественные пробелы в один
+    text = MULTI_NEWLINE_RE.sub('\n\n', text)  # Множественные переносы в двойной
 
     return text.strip()
 
@@ -136,7 +158,7 @@ def split_text_into_chunks(text: str, limit: int = 3000) -> List[str]:
             current_chunk = ""
 
             # Теперь дробим этот длинный абзац по предложениям
-            sentences = re.split(r'(?<=[.!?])\s+', paragraph)
+            sentences = SENTENCE_SPLIT_RE.split(paragraph)
             temp_paragraph_chunk = ""
             for sentence in sentences:
                 if len(temp_paragraph_chunk) + len(sentence) + 1 > limit:
@@ -176,11 +198,11 @@ def sanitize_filename(text: str, max_length: int = 100) -> str:
         return "audio"
 
     # Удаляем или заменяем недопустимые символы
-    sanitized = re.sub(r'[<>:"/\\|?*\x00-\x1F]', '', str(text))
+    sanitized = FILENAME_INVALID_CHARS_RE.sub('', str(text))
     # Заменяем пробелы на подчеркивания
-    sanitized = re.sub(r'\s+', '_', sanitized)
+    sanitized = WHITESPACE_RE.sub('_', sanitized)
     # Удаляем дублирующиеся точки и подчеркивания
-    sanitized = re.sub(r'__+', '_', sanitized)
+    sanitized = MULTI_UNDERSCORE_RE.sub('_', sanitized)
     sanitized = sanitized.replace('..', '.')
     # Обрезаем до максимальной длины
     return sanitized.strip('._')[:max_length]
@@ -0,0 +1,250 @@
+"""
+TTS Cache - кэш синтезированного аудио, адресуемый по содержимому
+Повторно присланный текст с теми же настройками отправляется без обращения к Edge TTS
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import re
+import tempfile
+import unicodedata
+from typing import AsyncContextManager, Awaitable, Callable, Dict, List, Optional
+
+from .storage_manager import StorageManager
+from .tts_service import synthesize_text_with_duration_limit
+
+
+def tts_cache_key(text: str, voice: str, rate: str, pitch: str, max_duration_minutes: Optional[int]) -> str:
+    """
+    Вычисляет ключ кэша для текста и настроек синтеза.
+
+    Лимит длительности входит в ключ, так как от него зависит разбиение на части.
+
+    Returns:
+        sha256 в hex
+    """
+    normalized = unicodedata.normalize('NFC', text).strip()
+    settings = f"{voice}|{rate}|{pitch}|{max_duration_minutes}|"
+    return hashlib.sha256(settings.encode('utf-8') + normalized.encode('utf-8')).hexdigest()
+
+
+class TTSCache:
+    """
+    Кэш аудио в директории StorageManager.
+
+    Одиночный файл хранится как cache_<key>.mp3, части - как cache_<key>_<N>of<M>.mp3:
+    количество частей записано в имени, отдельный манифест не нужен. Вытеснение
+    выполняет StorageManager по mtime, попадание в кэш обновляет mtime (LRU).
+    Запись с частично вытесненными частями считается промахом.
+
+    Одинаковые запросы, пришедшие одновременно, синтезируются один раз:
+    остальные ждут результат первого (single-flight).
+
+    Возвращенные файлы закреплены в StorageManager, чтобы очистка по запросу
+    другого пользователя не удалила их до отправки: после отправки вызывающий
+    код обязан вызвать release().
+    """
+
+    _PART_RE = re.compile(r"_(\d+)of(\d+)\.mp3$")
+
+    def __init__(self, storage_manager: StorageManager):
+        """
+        Args:
+            storage_manager: Менеджер хранилища, в директории которого лежит кэш
+        """
+        self.storage_manager = storage_manager
+        self.storage_dir = storage_manager.storage_dir
+        # Синтезы в процессе: ключ -> Future с путями в кэше (None, если синтез не удался)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _single_path(self, key: str) -> str:
+        return str(self.storage_dir / f"cache_{key}.mp3")
+
+    def _part_path(self, key: str, part_num: int, total_parts: int) -> str:
+        return str(self.storage_dir / f"cache_{key}_{part_num}of{total_parts}.mp3")
+
+    def _acquire(self, files: List[str]) -> Optional[List[str]]:
+        """Закрепляет файлы и проверяет, что очистка не успела удалить их раньше."""
+        for file_path in files:
+            self.storage_manager.pin_file(file_path)
+        if all(os.path.exists(file_path) for file_path in files):
+            for file_path in files:
+                self.storage_manager.touch_file(file_path)
+            return files
+        self.release(files)
+        return None
+
+    def release(self, files: Optional[List[str]]):
+        """Снимает закрепление с файлов, полученных из lookup/store/get_or_synthesize."""
+        for file_path in files or ():
+            self.storage_manager.unpin_file(file_path)
+
+    def _lookup(self, key: str) -> Optional[List[str]]:
+        single_path = self._single_path(key)
+        if os.path.exists(single_path):
+            return self._acquire([single_path])
+
+        parts = {}
+        total_parts = None
+        for file_path in self.storage_dir.glob(f"cache_{key}_*of*.mp3"):
+            match = self._PART_RE.search(file_path.name)
+            if match is None:
+                continue
+            parts[int(match.group(1))] = str(file_path)
+            total_parts = int(match.group(2))
+
+        if total_parts is None:
+            return None
+
+        files = [parts[i] for i in range(1, total_parts + 1) if i in parts]
+        if len(files) != total_parts:
+            return None
+
+        return self._acquire(files)
+
+    async def lookup(self, key: str) -> Optional[List[str]]:
+        """
+        Ищет готовое аудио по ключу.
+
+        Returns:
+            Закрепленные пути к файлам в порядке частей или None,
+            если записи нет или она неполная
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._lookup, key)
+
+    def _store(self, key: str, files: List[str]) -> List[str]:
+        total_parts = len(files)
+        if total_parts == 1:
+            targets = [self._single_path(key)]
+        else:
+            targets = [self._part_path(key, i, total_parts) for i in range(1, total_parts + 1)]
+
+        # Файлы переносятся только после успешного синтеза всех частей,
+        # поэтому недописанное аудио в кэш не попадает
+        for source, target in zip(files, targets):
+            self.storage_manager.pin_file(target)
+            os.replace(source, target)
+        return targets
+
+    async def store(self, key: str, files: List[str]) -> List[str]:
+        """
+        Переносит готовые файлы синтеза в кэш.
+
+        Args:
+            key: Ключ из tts_cache_key
+            files: Пути к файлам в порядке частей
+
+        Returns:
+            Новые (закрепленные) пути файлов в кэше
+        """
+        loop = asyncio.get_running_loop()
+        targets = await loop.run_in_executor(None, self._store, key, files)
+        # Кэш размера обновляется в event loop, а не из пула потоков
+        for target in targets:
+            self.storage_manager.add_file(target)
+        return targets
+
+    def _store_bytes(self, key: str, data: bytes) -> str:
+        target = self._single_path(key)
+        # Пишем во временный файл и переименовываем: lookup не увидит недописанное аудио
+        fd, tmp_path = tempfile.mkstemp(dir=self.storage_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return target
+
+    async def store_bytes(self, key: str, data: bytes) -> str:
+        """
+        Сохраняет в кэш аудио, синтезированное в память.
+
+        Файл не закрепляется: аудио уже отправлено из памяти.
+
+        Args:
+            key: Ключ из tts_cache_key
+            data: MP3-данные
+
+        Returns:
+            Путь файла в кэше
+        """
+        loop = asyncio.get_running_loop()
+        target = await loop.run_in_executor(None, self._store_bytes, key, data)
+        self.storage_manager.add_file(target)
+        return target
+
+    async def get_or_synthesize(
+        self,
+        text: str,
+        output_base_path: str,
+        *,
+        voice: str,
+        rate: str,
+        pitch: str,
+        max_duration_minutes: Optional[int] = None,
+        on_part_ready: Optional[Callable[[int, str, int], Awaitable[None]]] = None,
+        before_store: Optional[Callable[[], Awaitable[None]]] = None,
+        synthesis_slot: Optional[AsyncContextManager] = None
+    ) -> List[str]:
+        """
+        Возвращает аудио из кэша или синтезирует его и сохраняет в кэш.
+
+        Параметры те же, что у synthesize_text_with_duration_limit. При попадании
+        в кэш on_part_ready вызывается для каждой части по порядку, как при синтезе.
+        before_store вызывается после синтеза до переноса файлов в кэш: если части
+        отправляются в фоне, он должен дождаться отправки по старым путям.
+        synthesis_slot (например, asyncio.Semaphore) удерживается только на время
+        синтеза: ожидание before_store и перенос в кэш выполняются уже без него.
+        Возвращенные файлы принадлежат кэшу: удалять их после отправки не нужно,
+        но после отправки нужно снять закрепление через release().
+
+        Returns:
+            Пути к файлам в порядке частей (пустой список если синтез не удался)
+        """
+        key = tts_cache_key(text, voice, rate, pitch, max_duration_minutes)
+
+        files = await self.lookup(key)
+        while files is None and key in self._inflight:
+            # Тот же текст уже синтезируется для другого запроса - ждем его результат.
+            # shield: отмена ожидающего не должна отменять чужой синтез.
+            # Файлы берем повторным lookup, чтобы закрепить их для себя; если синтез
+            # не удался, повторяем проверку и при необходимости синтезируем сами
+            if await asyncio.shield(self._inflight[key]) is not None:
+                files = await self.lookup(key)
+
+        if files is not None:
+            print(f"♻️ Аудио взято из кэша: {len(files)} файл(ов)", flush=True)
+            if on_part_ready and len(files) > 1:
+                for part_num, file_path in enumerate(files, start=1):
+                    await on_part_ready(part_num, file_path, len(files))
+            return files
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        cached_files = None
+        try:
+            async with synthesis_slot or contextlib.nullcontext():
+                files = await synthesize_text_with_duration_limit(
+                    text,
+                    output_base_path,
+                    max_duration_minutes=max_duration_minutes,
+                    voice=voice,
+                    rate=rate,
+                    pitch=pitch,
+                    on_part_ready=on_part_ready
+                )
+            if not files:
+                return files
+            if before_store is not None:
+                await before_store()
+            cached_files = await self.store(key, files)
+            return cached_files
+        finally:
+            del self._inflight[key]
+            future.set_result(cached_files)
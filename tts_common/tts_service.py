@@ -5,9 +5,11 @@ TTS Service - основная логика синтеза речи
 
 import asyncio
 import os
+import shutil
 import time
-from typing import List, Callable, Optional, Awaitable
+from typing import List, Callable, Optional, Awaitable, AsyncIterator
 
+import aiofiles
 import edge_tts
 
 # --- КОНФИГУРАЦИЯ СИНТЕЗА ---
@@ -83,6 +85,53 @@ async def _merge_mp3_parts(part_files: List[str], final_path: str) -> bool:
                 pass
 
 
+async def synthesize_text_stream(
+    text: str,
+    voice: str = VOICE,
+    rate: str = DEFAULT_RATE,
+    pitch: str = DEFAULT_PITCH
+) -> AsyncIterator[bytes]:
+    """
+    Потоковый синтез: отдает куски MP3 по мере их получения от Edge TTS.
+
+    Args:
+        text: Текст для синтеза (не длиннее CHUNK_CHAR_LIMIT)
+        voice: Голос TTS
+        rate: Скорость речи
+        pitch: Высота тона
+
+    Yields:
+        Байты аудио в порядке воспроизведения
+    """
+    communicate = edge_tts.Communicate(text=text, voice=voice, rate=rate, pitch=pitch)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            yield chunk["data"]
+
+
+async def _stream_to_file(text: str, mp3_path: str, voice: str, rate: str, pitch: str):
+    """Пишет потоковый синтез в файл по мере поступления данных, не блокируя event loop."""
+    async with aiofiles.open(mp3_path, 'wb') as f:
+        async for audio in synthesize_text_stream(text, voice, rate, pitch):
+            await f.write(audio)
+
+
+async def _stream_to_bytes(text: str, voice: str, rate: str, pitch: str) -> bytes:
+    """Собирает потоковый синтез в память."""
+    return b"".join([audio async for audio in synthesize_text_stream(text, voice, rate, pitch)])
+
+
+def _validate_audio_size(file_size: int, text: str):
+    """Проверяет, что аудио не обрезано: размер должен соответствовать длине текста."""
+    expected_min_size = len(text) * MIN_BYTES_PER_CHAR
+    min_required_size = int(expected_min_size * VALIDATION_TOLERANCE)
+
+    if file_size < min_required_size:
+        raise ValueError(
+            f"Валидация провалена: размер файла {file_size} Б, < требуемых {min_required_size} Б."
+        )
+
+
 async def _synthesize_single_chunk(
     text: str,
     mp3_path: str,
@@ -95,23 +144,14 @@ async def _synthesize_single_chunk(
     """
     current_delay = INITIAL_RETRY_DELAY
     for attempt in range(MAX_RETRIES):
-        communicate = None
         try:
-            # Создаем Communicate без стилей (они не поддерживаются edge-tts)
-            communicate = edge_tts.Communicate(text=text, voice=voice, rate=rate, pitch=pitch)
-            await asyncio.wait_for(communicate.save(mp3_path), timeout=600.0)
+            # Аудио пишется на диск по мере синтеза, а не после получения всего ответа
+            await asyncio.wait_for(_stream_to_file(text, mp3_path, voice, rate, pitch), timeout=600.0)
 
             if not os.path.exists(mp3_path):
                 raise ValueError("Файл не был создан после сохранения.")
 
-            file_size = os.path.getsize(mp3_path)
-            expected_min_size = len(text) * MIN_BYTES_PER_CHAR
-            min_required_size = int(expected_min_size * VALIDATION_TOLERANCE)
-
-            if file_size < min_required_size:
-                raise ValueError(
-                    f"Валидация провалена: размер файла {file_size} Б, < требуемых {min_required_size} Б."
-                )
+            _validate_audio_size(os.path.getsize(mp3_path), text)
 
             print(f"✅ Успешно создан и проверен файл: {os.path.basename(mp3_path)}", flush=True)
             return True
@@ -131,20 +171,6 @@ async def _synthesize_single_chunk(
             else:
                 print(f"❌ Не удалось синтезировать {os.path.basename(mp3_path)} после {MAX_RETRIES} попыток.", flush=True)
                 return False
-        finally:
-            # CRITICAL: Explicitly close aiohttp session to prevent event loop blocking
-            # This is especially important when running under uvloop
-            if communicate is not None:
-                try:
-                    # edge-tts Communicate doesn't have explicit close(),
-                    # but we need to ensure any underlying aiohttp session is closed
-                    if hasattr(communicate, 'close'):
-                        await communicate.close()
-                    # Force garbage collection of the communicate object
-                    del communicate
-                except Exception as close_error:
-                    # Silently ignore close errors, but log them for debugging
-                    print(f"   [DEBUG] Error closing communicate: {close_error}", flush=True)
     return False
 
 
@@ -260,6 +286,66 @@ async def synthesize_text(
     return final_success
 
 
+async def synthesize_text_to_bytes(
+    text: str,
+    voice: str = VOICE,
+    rate: str = DEFAULT_RATE,
+    pitch: str = DEFAULT_PITCH,
+    chunk_limit: int = CHUNK_CHAR_LIMIT
+) -> Optional[bytes]:
+    """
+    Синтезирует короткий текст в память, без записи на диск.
+
+    Для аудио, которое отправляется и сразу забывается: не нужны ни запись файла,
+    ни повторное чтение при загрузке, ни удаление. Повторные попытки и валидация -
+    как у synthesize_text. Сшивка частей требует ffmpeg и файлов, поэтому текст
+    должен помещаться в один чанк.
+
+    Args:
+        text: Текст для синтеза
+        voice: Голос TTS
+        rate: Скорость речи
+        pitch: Высота тона
+        chunk_limit: Максимальный размер одного чанка в символах
+
+    Returns:
+        MP3 в байтах или None если синтез не удался
+
+    Raises:
+        ValueError: Если текст не помещается в один чанк
+    """
+    from .text_utils import split_text_into_chunks
+
+    chunks = split_text_into_chunks(text, chunk_limit)
+    if not chunks:
+        print("❌ Ошибка: текст пустой или некорректный.", flush=True)
+        return None
+    if len(chunks) > 1:
+        raise ValueError(f"Текст длиннее {chunk_limit} символов, используйте synthesize_text")
+
+    chunk_text = chunks[0]
+    current_delay = INITIAL_RETRY_DELAY
+    for attempt in range(MAX_RETRIES):
+        try:
+            async with TTS_SEMAPHORE:
+                audio = await asyncio.wait_for(
+                    _stream_to_bytes(chunk_text, voice, rate, pitch), timeout=600.0
+                )
+            _validate_audio_size(len(audio), chunk_text)
+            print(f"✅ Синтезировано в память: {len(audio)} Б", flush=True)
+            return audio
+
+        except Exception as e:
+            print(f"⚠️ Ошибка синтеза (попытка {attempt + 1}/{MAX_RETRIES}): {e}", flush=True)
+            if attempt < MAX_RETRIES - 1:
+                print(f"   Повторная попытка через {current_delay} секунд...", flush=True)
+                await asyncio.sleep(current_delay)
+                current_delay *= 2
+
+    print(f"❌ Не удалось синтезировать текст после {MAX_RETRIES} попыток.", flush=True)
+    return None
+
+
 async def synthesize_text_chunks(
     chunks: List[str],
     output_path: str,
@@ -278,6 +364,75 @@ async def synthesize_text_chunks(
     return await synthesize_text(full_text, output_path, voice, rate, pitch)
 
 
+async def synthesize_texts_merged(
+    texts: List[str],
+    output_path: str,
+    voice: str = VOICE,
+    rate: str = DEFAULT_RATE,
+    pitch: str = DEFAULT_PITCH,
+    concurrency: int = 3
+) -> List[int]:
+    """
+    Синтезирует независимые тексты параллельно и сшивает их в один MP3.
+
+    Каждый текст пишется в отдельный файл, поэтому ошибка одного текста
+    не теряет остальные - он просто пропускается. Без ffmpeg тексты
+    объединяются и синтезируются одним вызовом synthesize_text.
+
+    Args:
+        texts: Тексты в порядке воспроизведения
+        output_path: Путь для итогового MP3 файла
+        voice: Голос TTS
+        rate: Скорость речи
+        pitch: Высота тона
+        concurrency: Сколько текстов синтезируется одновременно
+
+    Returns:
+        Индексы текстов, вошедших в итоговый файл (пустой список при неудаче)
+    """
+    if not texts:
+        return []
+
+    if len(texts) == 1 or shutil.which('ffmpeg') is None:
+        success = await synthesize_text("\n\n".join(texts), output_path, voice, rate, pitch)
+        return list(range(len(texts))) if success else []
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def synthesize_one(idx: int, text_content: str) -> bool:
+        async with semaphore:
+            return await synthesize_text(text_content, f"{output_path}.{idx}.mp3", voice, rate, pitch)
+
+    results = await asyncio.gather(
+        *(synthesize_one(i, text_content) for i, text_content in enumerate(texts)),
+        return_exceptions=True
+    )
+
+    voiced_indices = []
+    for i, result in enumerate(results):
+        if result is True:
+            voiced_indices.append(i)
+        else:
+            print(f"⚠️ Текст {i + 1}/{len(texts)} пропущен: синтез не удался ({result})", flush=True)
+
+    if not voiced_indices:
+        return []
+
+    part_files = [f"{output_path}.{i}.mp3" for i in voiced_indices]
+    if len(part_files) == 1:
+        os.replace(part_files[0], output_path)
+        return voiced_indices
+
+    if not await _merge_mp3_parts(part_files, output_path):
+        return []
+
+    return voiced_indices
+
+
 async def synthesize_text_with_duration_limit(
     text: str,
     output_base_path: str,
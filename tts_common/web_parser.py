@@ -5,16 +5,18 @@ Web Parser - извлечение текста из веб-страниц и с
 
 import re
 from typing import Optional
-from urllib.parse import urlparse
+
+# Шаблон поиска URL в произвольном тексте (компилируется один раз)
+URL_RE = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
+# Строка целиком считается ссылкой, если это http(s) с непустым хостом -
+# то же условие, что scheme + netloc у urlparse, но без разбора всей строки
+VALID_URL_RE = re.compile(r'https?://[^/?#]', re.IGNORECASE)
 
 
 def is_valid_url(url: str) -> bool:
     """Проверяет, является ли строка валидным URL."""
-    try:
-        result = urlparse(url)
-        return all([result.scheme in ('http', 'https'), result.netloc])
-    except Exception:
-        return False
+    return VALID_URL_RE.match(url) is not None
 
 
 def parse_url(url: str, include_comments: bool = False) -> str:
@@ -91,6 +93,5 @@ def extract_urls_from_text(text: str) -> list[str]:
     Returns:
         Список найденных URL
     """
-    url_pattern = r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+'
-    urls = re.findall(url_pattern, text)
+    urls = URL_RE.findall(text)
     return [url for url in urls if is_valid_url(url)]
@@ -3,7 +3,6 @@ Web TTS - FastAPI приложение для озвучивания текст
 """
 
 import os
-import sys
 import asyncio
 import uuid
 import hashlib
@@ -19,9 +18,6 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
 
-# Добавляем путь к tts_common
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -30,7 +26,7 @@ load_dotenv()
 asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
 
 from tts_common import synthesize_text, StorageManager, parse_document
-from tts_common.document_parser import SUPPORTED_EXTENSIONS
+from tts_common.document_parser import SUPPORTED_EXTENSIONS_SET, SUPPORTED_EXTENSIONS_TEXT
 
 # Google Drive integration
 from google_drive import get_drive_service
@@ -246,13 +242,13 @@ async def periodic_cleanup():
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Главная страница с формой ввода текста и загрузки документов"""
-    stats = storage_manager.get_storage_stats()
+    stats = await storage_manager.get_storage_stats_async()
 
     return templates.TemplateResponse("index.html", {
         "request": request,
         "default_rate": DEFAULT_RATE,
         "storage_stats": stats,
-        "supported_extensions": ", ".join(SUPPORTED_EXTENSIONS)
+        "supported_extensions": SUPPORTED_EXTENSIONS_TEXT
     })
 
 
@@ -378,10 +374,10 @@ async def synthesize_document(
 
     # Проверяем расширение файла
     file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in SUPPORTED_EXTENSIONS:
+    if file_ext not in SUPPORTED_EXTENSIONS_SET:
         raise HTTPException(
             status_code=400,
-            detail=f"Формат файла '{file_ext}' не поддерживается. Поддерживаемые: {', '.join(SUPPORTED_EXTENSIONS)}"
+            detail=f"Формат файла '{file_ext}' не поддерживается. Поддерживаемые: {SUPPORTED_EXTENSIONS_TEXT}"
         )
 
     # Валидация rate
@@ -605,7 +601,7 @@ async def get_history(request: Request, limit: int = 50, offset: int = 0):
 @app.get("/stats")
 async def get_stats():
     """Эндпоинт для получения статистики хранилища"""
-    stats = storage_manager.get_storage_stats()
+    stats = await storage_manager.get_storage_stats_async()
     return stats
 
 
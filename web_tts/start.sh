@@ -3,6 +3,10 @@
 
 echo "Starting Web TTS Application..."
 
+# Работаем из директории скрипта, корень репозитория - в PYTHONPATH (tts_common)
+cd "$(dirname "$0")"
+export PYTHONPATH="$(cd .. && pwd)${PYTHONPATH:+:$PYTHONPATH}"
+
 # Проверка виртуального окружения
 if [ -d "venv" ]; then
     source venv/bin/activate